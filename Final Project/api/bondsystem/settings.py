@@ -75,6 +75,20 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # The web app and Celery import workers share this file. WAL lets readers run alongside the
+        # single writer, and a writer waits up to `timeout` seconds for the lock instead of failing
+        # with "database is locked". IMMEDIATE transactions take the write lock at BEGIN, so a
+        # transaction never has to upgrade a read lock mid-way (which SQLite cannot wait on).
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA cache_size=-65536;'
+            ),
+        },
     }
 }
 
@@ -139,6 +153,11 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE # Use TIME_ZONE from Django settings (UTC)
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# SQLite allows a single writer, so all Excel import tasks go to their own queue, consumed by one
+# worker process (see docker-compose.yml); other tasks (emails) stay on the default 'celery' queue.
+CELERY_TASK_ROUTES = {
+    'portfolio.tasks.import_*': {'queue': 'imports'},
+}
 
 # --- ADDED CELERY_BEAT_SCHEDULE ---
 CELERY_BEAT_SCHEDULE = {
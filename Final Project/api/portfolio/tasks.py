@@ -2,10 +2,15 @@
 
 import os
 import logging
-import time
+import re
+import sys
 import openpyxl
-from celery import shared_task, chain
-from django.db import transaction, IntegrityError, OperationalError
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
+from celery import shared_task, chain, group
+from django.db import transaction, OperationalError
+from django.db.backends.utils import format_number
 from django.conf import settings
 from django.core.mail import send_mail
 from django.utils import timezone
@@ -17,8 +22,6 @@ from .models import (
 )
 # Import Decimal for data cleaning
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
-# Import FieldError for specific error handling
-from django.core.exceptions import FieldError
 # Import validator for email
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError as DjangoValidationError
@@ -29,23 +32,33 @@ log = logging.getLogger(__name__)
 
 # --- Helper Functions (Keep existing ones: clean_decimal, clean_date, clean_boolean_from_char) ---
 
-def clean_decimal(value, default=None, max_digits=None, decimal_places=None, non_negative=False):
+def clean_decimal(value, default=None, max_digits=None, decimal_places=None, non_negative=False, quiet=False):
     """
     Safely convert value to Decimal, applying validation rules.
     Returns default if conversion fails or validation rules are not met.
+    quiet=True skips the warnings, for callers that report invalid values themselves.
     """
-    if value is None or str(value).strip() == '':
+    if value is None:
         return default
     try:
-        str_value = str(value).strip().replace(',', '') # Handle commas
-        if '%' in str_value: str_value = str_value.replace('%', '').strip() # Handle percentage signs
-        if str_value.startswith('(') and str_value.endswith(')'): str_value = '-' + str_value[1:-1] # Handle accounting negatives
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Numeric cells (openpyxl returns int/float) need none of the string clean-up below
+            if value != value: return default # NaN
+            str_value = repr(value)
+        else:
+            str_value = str(value).strip()
+            if str_value == '':
+                return default
+            if any(c in str_value for c in '%,()'):
+                str_value = str_value.replace(',', '') # Handle commas
+                if '%' in str_value: str_value = str_value.replace('%', '').strip() # Handle percentage signs
+                if str_value.startswith('(') and str_value.endswith(')'): str_value = '-' + str_value[1:-1] # Handle accounting negatives
 
         d = Decimal(str_value)
 
         # Validation: Non-negative
         if non_negative and d < 0:
-            log.warning(f"Validation failed: Value '{value}' converted to '{d}' is negative, but non-negative required. Using default '{default}'.")
+            if not quiet: log.warning(f"Validation failed: Value '{value}' converted to '{d}' is negative, but non-negative required. Using default '{default}'.")
             return default
 
         # Validation: Max digits and decimal places (if specified)
@@ -57,7 +70,7 @@ def clean_decimal(value, default=None, max_digits=None, decimal_places=None, non
             # Let's just check the number of places in the string representation for logging.
             if '.' in str_value:
                 actual_dp = len(str_value.split('.')[-1])
-                if actual_dp > decimal_places:
+                if actual_dp > decimal_places and not quiet:
                      log.warning(f"Value '{value}' has more than {decimal_places} decimal places. Precision might be lost on save.")
                      # Optional: Quantize here if strict enforcement needed before DB save
                      # d = d.quantize(Decimal('1e-' + str(decimal_places)), rounding=ROUND_HALF_UP)
@@ -68,14 +81,69 @@ def clean_decimal(value, default=None, max_digits=None, decimal_places=None, non
 
         return d
     except (InvalidOperation, TypeError, ValueError):
-        log.warning(f"Could not convert '{value}' to Decimal, using default '{default}'")
+        if not quiet: log.warning(f"Could not convert '{value}' to Decimal, using default '{default}'")
         return default
 
-def clean_date(value, default=None, date_format='%m/%d/%Y'):
+def clean_integer(value, default=None, non_negative=False, quiet=False):
+    """
+    Safely convert value to int for whole-number fields (IDs, ticket and customer numbers), return default if conversion fails.
+    Integer cells and plain integer strings skip Decimal parsing; anything else goes through clean_decimal
+    and is truncated like int(Decimal). quiet=True skips the warnings, as in clean_decimal.
+    """
+    number = None
+    if isinstance(value, int) and not isinstance(value, bool):
+        number = value
+    elif isinstance(value, str):
+        try: number = int(value)
+        except ValueError: pass # Decimals, commas, percentages etc. are handled by clean_decimal below
+    if number is None:
+        d = clean_decimal(value, quiet=quiet)
+        if d is None: return default
+        if not d.is_finite():
+            if not quiet: log.warning(f"Could not convert '{value}' to an integer, using default '{default}'")
+            return default
+        number = int(d)
+    if non_negative and number < 0:
+        if not quiet: log.warning(f"Validation failed: Value '{value}' converted to '{number}' is negative, but non-negative required. Using default '{default}'.")
+        return default
+    return number
+
+# Allowed code values and defaults, built once at import instead of per row
+_TAX_CODES = frozenset(('e', 't'))
+_INTEREST_CALC_CODES = frozenset(('a', 'c', 'h')) # Assuming model choices are 'a', 'c', 'h'
+_INTENTION_CODES = frozenset(('A', 'M', 'T'))
+_DEFAULT_FACTOR = Decimal('1.0')
+
+# CUSIP shape (9 uppercase letters/digits), checked in one C-level match instead of len() plus isalnum()
+_CUSIP_MATCH = re.compile(r'[A-Z0-9]{9}').fullmatch
+
+@lru_cache(maxsize=4096)
+def _cached_validate_email(email_str):
+    """ Runs Django's validate_email once per distinct address. Returns True if the address is valid. """
+    try:
+        validate_email(email_str)
+    except DjangoValidationError:
+        return False
+    return True
+
+@lru_cache(maxsize=4096)
+def _cached_parse_date(value_str, date_format):
+    """ Parses a date string with one strptime format, once per distinct (string, format). Returns None if it does not match. """
+    try:
+        return datetime.strptime(value_str, date_format).date()
+    except (ValueError, TypeError):
+        return None
+
+# {cache_key: format that last parsed a string date for that column}, filled in by clean_date
+_date_format_cache = {}
+
+def clean_date(value, default=None, date_format='%m/%d/%Y', cache_key=None):
     """
     Safely convert value to Date using a specific format, return default if conversion fails.
     Handles datetime objects from openpyxl.
     Returns None for clearly invalid date strings like '01/  /'.
+    If cache_key is given (e.g. 'holdings.settlement_date'), the format that last worked for that
+    column is tried first, so a column in a fallback format costs one strptime per value.
     """
     if value is None: return default
     if isinstance(value, datetime): return value.date()
@@ -112,27 +180,89 @@ def clean_date(value, default=None, date_format='%m/%d/%Y'):
                 return None
         # --- End added check ---
 
-        try:
-            # Attempt parsing with the primary expected format first
-            return datetime.strptime(value_str, date_format).date()
-        except (ValueError, TypeError):
-            # Try fallback formats if primary fails
-            fallback_formats = ('%Y-%m-%d', '%m-%d-%Y', '%Y%m%d')
-            for fmt in fallback_formats:
-                try: return datetime.strptime(value_str, fmt).date()
-                except (ValueError, TypeError): continue
-            log.warning(f"Could not parse date string '{value_str}' with formats '{date_format}' or fallbacks {fallback_formats}.")
-            return default
+        # Try the column's last working format first, then the primary expected format, then fallbacks
+        fallback_formats = ('%Y-%m-%d', '%m-%d-%Y', '%Y%m%d')
+        cached_format = _date_format_cache.get(cache_key) if cache_key else None
+        if cached_format:
+            parsed = _cached_parse_date(value_str, cached_format)
+            if parsed is not None: return parsed
+        for fmt in (date_format,) + fallback_formats:
+            if fmt == cached_format: continue # Already tried
+            parsed = _cached_parse_date(value_str, fmt)
+            if parsed is None: continue
+            if cache_key: _date_format_cache[cache_key] = fmt
+            return parsed
+        log.warning(f"Could not parse date string '{value_str}' with formats '{date_format}' or fallbacks {fallback_formats}.")
+        return default
 
     log.warning(f"Value '{value}' type '{type(value)}' could not be converted to Date.")
     return default
 
-def clean_boolean_from_char(value, true_chars=('y', 'yes', 'true', '1', 't')):
+_TRUE_CHARS = frozenset(('y', 'yes', 'true', '1', 't'))
+
+def clean_boolean_from_char(value, true_chars=_TRUE_CHARS):
     """ Converts a character/string (like 'y'/'n') to Boolean. Case-insensitive. """
     if value is None:
         return None # Or False depending on desired default for missing values
     return str(value).strip().lower() in true_chars
 
+def clean_string(value, default=''):
+    """ Converts a cell value to a stripped string. Empty cells (None) return default. """
+    if value is None:
+        return default
+    return str(value).strip()
+
+_SPACE_TO_UNDERSCORE = str.maketrans(' ', '_')
+
+def normalize_header(header):
+    """ Normalizes an Excel header or header_map key for matching: lowercase, spaces as underscores. """
+    return header.lower().translate(_SPACE_TO_UNDERSCORE)
+
+def build_row_extractor(col_idx_map, internal_names):
+    """
+    Builds a function that pulls the given fields (two or more) out of a values_only row tuple
+    by column position, returning them as a tuple in the order of internal_names.
+    Fields whose header is absent from the file, and cells past the end of a short row, come back as None.
+    """
+    missing_col = max(col_idx_map.values(), default=-1) + 1 # Padding column that is always None
+    get_fields = itemgetter(*(col_idx_map.get(name, missing_col) for name in internal_names))
+    if all(name in col_idx_map for name in internal_names):
+        row_width = missing_col
+        padding = (None,) * row_width
+
+        def extract(row):
+            if len(row) < row_width: row = (*row, *padding[len(row):])
+            return get_fields(row)
+    else:
+        # Unmapped fields read the padding column, so cells past the last mapped column are always cut off
+        padding = (None,) * (missing_col + 1)
+
+        def extract(row):
+            return get_fields((*row[:missing_col], *padding[min(len(row), missing_col):]))
+    return extract
+
+# Per-row warnings logged for each issue reason before the rest are only counted
+_MAX_ROW_WARNINGS_PER_REASON = 20
+
+def log_row_issue(row_issues, reason, message, *args):
+    """
+    Counts a per-row data issue under reason (row_issues is a Counter) and logs message % args as a warning.
+    Only the first _MAX_ROW_WARNINGS_PER_REASON issues per reason are formatted and logged, so a file with
+    the same problem on every row doesn't spend its time writing warnings; see log_row_issue_summary.
+    """
+    row_issues[reason] += 1
+    if row_issues[reason] <= _MAX_ROW_WARNINGS_PER_REASON:
+        log.warning(message, *args)
+
+def log_row_issue_summary(import_name, row_issues):
+    """ Logs the per-reason totals collected by log_row_issue, noting how many warnings were not logged. """
+    if not row_issues: return
+    suppressed = sum(max(count - _MAX_ROW_WARNINGS_PER_REASON, 0) for count in row_issues.values())
+    log.info("%s: Row issues by reason: %s", import_name, dict(row_issues))
+    if suppressed:
+        log.warning("%s: %s further row warnings were not logged individually (limit %s per reason).",
+                    import_name, suppressed, _MAX_ROW_WARNINGS_PER_REASON)
+
 # --- NEW Lookup Import Tasks (Keep existing ones) ---
 
 @shared_task(bind=True, autoretry_for=(OperationalError,), retry_backoff=5, max_retries=3)
@@ -143,7 +273,6 @@ def import_salespersons_from_excel(self, file_path):
     """
     log.info(f"Starting Salesperson import/update from {file_path}")
     updated_count = 0; created_count = 0; skipped_rows = 0
-    max_retries_per_row = 3; retry_delay = 0.5
 
     # Define expected Excel headers and map to model fields
     header_map = {
@@ -154,17 +283,18 @@ def import_salespersons_from_excel(self, file_path):
     mandatory_internal_names = ['salesperson_id'] # Name and Email are optional in model
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"Salesperson file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening salesperson file {file_path}: {e}", exc_info=True); raise
 
     # Read actual headers from file and map them using header_map
-    excel_headers = [str(cell.value).strip() if cell.value else None for cell in ws[1]]
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    excel_headers = [str(value).strip() if value else None for value in header_row]
     col_idx_map = {}
     processed_excel_headers = []
     for idx, excel_header in enumerate(excel_headers):
         if excel_header:
-            normalized_header = excel_header.lower().replace(' ', '_')
+            normalized_header = normalize_header(excel_header)
             internal_name = header_map.get(normalized_header)
             if internal_name:
                 col_idx_map[internal_name] = idx
@@ -182,32 +312,30 @@ def import_salespersons_from_excel(self, file_path):
         wb.close()
         raise ValueError(f"Mandatory salesperson headers missing: {missing_mandatory}")
 
+    # Column positions are resolved once; rows are unpacked by index instead of via a per-row dict
+    max_col = max(col_idx_map.values()) + 1 # Cells right of the last mapped column are never read
+    extract_salesperson_fields = build_row_extractor(col_idx_map, ('salesperson_id', 'name', 'email'))
+    staged_salespersons = {} # {salesperson_id: unsaved Salesperson}; a later row for an ID replaces the earlier one
+
     # Iterate through rows
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        raw_data = {}
-        for internal_name, col_idx in col_idx_map.items():
-            if col_idx < len(row): raw_data[internal_name] = row[col_idx]
-            else: raw_data[internal_name] = None
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
+        salesperson_id_raw, name_raw, email_raw = extract_salesperson_fields(row)
 
         # --- Data Extraction and Cleaning ---
-        salesperson_id = raw_data.get('salesperson_id')
+        salesperson_id = clean_string(salesperson_id_raw) # Keep as string; stripped once, then checked
         if not salesperson_id: log.warning(f"Salesperson Row {row_idx}: Skip missing slsm_id."); skipped_rows += 1; continue
-        salesperson_id = str(salesperson_id).strip() # Keep as string
 
-        name = str(raw_data.get('name', '')).strip() or None # Allow empty name if model allows (blank=True)
+        name = clean_string(name_raw) or None # Allow empty name if model allows (blank=True)
 
         # *** ADDED Email Cleaning ***
-        email_raw = raw_data.get('email')
         email = None
-        if email_raw:
-            email_str = str(email_raw).strip()
-            if email_str: # Only proceed if email is not empty after stripping
-                try:
-                    validate_email(email_str) # Use Django's validator
-                    email = email_str
-                except DjangoValidationError:
-                    log.warning(f"Salesperson Row {row_idx} ID {salesperson_id}: Invalid email format '{email_raw}'. Storing as NULL.")
-                    email = None # Set to None if invalid format
+        email_str = clean_string(email_raw)
+        if email_str: # Only proceed if email is not empty after stripping
+            # Values with no '@' are rejected without building a ValidationError; validate_email (memoized per address) decides the rest
+            if '@' in email_str and _cached_validate_email(email_str):
+                email = email_str
+            else:
+                log.warning(f"Salesperson Row {row_idx} ID {salesperson_id}: Invalid email format '{email_raw}'. Storing as NULL.")
         # *** END Email Cleaning ***
 
         # Prepare defaults dictionary
@@ -220,34 +348,27 @@ def import_salespersons_from_excel(self, file_path):
         # Decide if you want this behavior or if NULL should overwrite existing values
         # data_defaults = {k: v for k, v in data_defaults.items() if v is not None}
 
-        # --- Database Operation ---
-        retries = 0; success = False
-        while retries < max_retries_per_row and not success:
-            try:
-                with transaction.atomic():
-                    sp, created = Salesperson.objects.update_or_create(
-                        salesperson_id=salesperson_id, # Match based on PK
-                        defaults=data_defaults
-                    )
-                success = True
-                if created: created_count += 1; log.debug(f"Salesperson Row {row_idx}: Created: {salesperson_id} (Email: {email})")
-                else: updated_count += 1; log.debug(f"Salesperson Row {row_idx}: Updated: {salesperson_id} (Email: {email})")
-            except OperationalError as e:
-                if 'database is locked' in str(e).lower() and retries < max_retries_per_row - 1:
-                    retries += 1; wait_time = retry_delay * (2**retries); log.warning(f"Salesperson Row {row_idx}: DB locked {salesperson_id}. Retry {retries}/{max_retries_per_row-1} in {wait_time:.2f}s"); time.sleep(wait_time)
-                else:
-                    log.error(f"Salesperson Row {row_idx}: OpError {salesperson_id} retries {retries}: {e}")
-                    # Let celery handle final retry based on task decorator
-                    if retries >= max_retries_per_row -1: self.retry(exc=e)
-                    skipped_rows += 1; break # Break local loop after triggering retry or final failure
-            except IntegrityError as e:
-                # This could happen if the email being imported conflicts with an existing one
-                # AND the email field has unique=True in the model (which it does).
-                log.error(f"Salesperson Row {row_idx}: IntegrityError {salesperson_id} (Likely duplicate email '{email}'): {e}");
-                skipped_rows += 1; break
-            except Exception as e: log.error(f"Salesperson Row {row_idx}: Error {salesperson_id}: {e}", exc_info=True); skipped_rows += 1; break
+        staged_salespersons[salesperson_id] = Salesperson(salesperson_id=salesperson_id, **data_defaults)
+        log.debug("Salesperson Row %s: Staged: %s (Email: %s)", row_idx, salesperson_id, email)
 
     wb.close()
+
+    # --- Database Operation ---
+    # One INSERT ... ON CONFLICT (salesperson_id) DO UPDATE per batch, in a single transaction.
+    # A locked database (OperationalError) propagates; autoretry_for on the task reruns the file.
+    try:
+        with transaction.atomic():
+            updated_count = Salesperson.objects.filter(salesperson_id__in=staged_salespersons.keys()).count()
+            Salesperson.objects.bulk_create(
+                staged_salespersons.values(), batch_size=500, update_conflicts=True,
+                unique_fields=['salesperson_id'], update_fields=['name', 'email', 'last_modified_at'],
+            )
+        created_count = len(staged_salespersons) - updated_count
+    except OperationalError: raise # Retried as a whole file by the task decorator
+    except Exception as e:
+        log.error(f"Salesperson Bulk Write: Error writing salespersons, no changes saved: {e}", exc_info=True)
+        skipped_rows += len(staged_salespersons); created_count = 0; updated_count = 0 # Nothing was saved
+
     result_message = f"Imported/Updated Salespersons from {os.path.basename(file_path)}. Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_rows}."
     log.info(result_message)
     return file_path # Return path for chaining
@@ -262,7 +383,6 @@ def import_security_types_from_excel(self, file_path):
     """
     log.info(f"Starting SecurityType import/update from {file_path}")
     updated_count = 0; created_count = 0; skipped_rows = 0
-    max_retries_per_row = 3; retry_delay = 0.5
 
     # Define expected Excel headers and map to model fields
     header_map = {
@@ -274,17 +394,18 @@ def import_security_types_from_excel(self, file_path):
     mandatory_internal_names = ['type_id', 'name'] # Both ID and name are required
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"SecurityType file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening SecurityType file {file_path}: {e}", exc_info=True); raise
 
     # Read actual headers and map
-    excel_headers = [str(cell.value).strip() if cell.value else None for cell in ws[1]]
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    excel_headers = [str(value).strip() if value else None for value in header_row]
     col_idx_map = {}
     processed_excel_headers = []
     for idx, excel_header in enumerate(excel_headers):
         if excel_header:
-            normalized_header = excel_header.lower().replace(' ', '_')
+            normalized_header = normalize_header(excel_header)
             internal_name = header_map.get(normalized_header)
             if internal_name:
                 col_idx_map[internal_name] = idx
@@ -302,26 +423,23 @@ def import_security_types_from_excel(self, file_path):
         wb.close()
         raise ValueError(f"Mandatory SecurityType headers missing: {missing_mandatory}")
 
+    # Column positions are resolved once; rows are unpacked by index instead of via a per-row dict
+    max_col = max(col_idx_map.values()) + 1 # Cells right of the last mapped column are never read
+    extract_security_type_fields = build_row_extractor(col_idx_map, ('type_id', 'name', 'description'))
+    staged_security_types = {} # {type_id: unsaved SecurityType}; a later row for an ID replaces the earlier one
+
     # Iterate through rows
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        raw_data = {}
-        for internal_name, col_idx in col_idx_map.items():
-            if col_idx < len(row): raw_data[internal_name] = row[col_idx]
-            else: raw_data[internal_name] = None
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
+        type_id_raw, name_raw, description_raw = extract_security_type_fields(row)
 
         # --- Data Extraction and Cleaning ---
-        type_id_raw = raw_data.get('type_id')
-        type_id = clean_decimal(type_id_raw) # Clean as decimal first
+        type_id = clean_integer(type_id_raw)
         if type_id is None: log.warning(f"SecurityType Row {row_idx}: Skip missing or invalid sec_type '{type_id_raw}'."); skipped_rows += 1; continue
-        try:
-            type_id = int(type_id) # Convert to int
-        except (ValueError, TypeError):
-             log.warning(f"SecurityType Row {row_idx}: Could not convert sec_type '{type_id_raw}' to integer. Skipping."); skipped_rows += 1; continue
 
-        name = str(raw_data.get('name', '')).strip()
+        name = clean_string(name_raw)
         if not name: log.warning(f"SecurityType Row {row_idx} ID {type_id}: Skip missing meaning/name."); skipped_rows += 1; continue
 
-        description = str(raw_data.get('description', '')).strip() or None # Optional description
+        description = clean_string(description_raw) or None # Optional description
 
         # Prepare defaults dictionary
         data_defaults = {
@@ -330,31 +448,28 @@ def import_security_types_from_excel(self, file_path):
         }
         data_defaults = {k: v for k, v in data_defaults.items() if v is not None}
 
-        # --- Database Operation ---
-        retries = 0; success = False
-        while retries < max_retries_per_row and not success:
-            try:
-                with transaction.atomic():
-                    st, created = SecurityType.objects.update_or_create(
-                        type_id=type_id, # Match based on PK
-                        defaults=data_defaults
-                    )
-                success = True
-                if created: created_count += 1; log.debug(f"SecurityType Row {row_idx}: Created: {type_id}")
-                else: updated_count += 1; log.debug(f"SecurityType Row {row_idx}: Updated: {type_id}")
-            except OperationalError as e:
-                if 'database is locked' in str(e).lower() and retries < max_retries_per_row - 1:
-                    retries += 1; wait_time = retry_delay * (2**retries); log.warning(f"SecurityType Row {row_idx}: DB locked {type_id}. Retry {retries}/{max_retries_per_row-1} in {wait_time:.2f}s"); time.sleep(wait_time)
-                else:
-                    log.error(f"SecurityType Row {row_idx}: OpError {type_id} retries {retries}: {e}")
-                    if retries >= max_retries_per_row -1: self.retry(exc=e)
-                    skipped_rows += 1; break
-            except IntegrityError as e:
-                # This should no longer happen for the name field, but could happen if type_id is duplicated in the file
-                log.error(f"SecurityType Row {row_idx}: IntegrityError {type_id}: {e}"); skipped_rows += 1; break
-            except Exception as e: log.error(f"SecurityType Row {row_idx}: Error {type_id}: {e}", exc_info=True); skipped_rows += 1; break
+        staged_security_types[type_id] = SecurityType(type_id=type_id, **data_defaults)
+        log.debug("SecurityType Row %s: Staged: %s", row_idx, type_id)
 
     wb.close()
+
+    # --- Database Operation ---
+    # One INSERT ... ON CONFLICT (type_id) DO UPDATE per batch, in a single transaction. Only the name is
+    # overwritten: description has no mapped column, so existing descriptions are kept.
+    # A locked database (OperationalError) propagates; autoretry_for on the task reruns the file.
+    try:
+        with transaction.atomic():
+            updated_count = SecurityType.objects.filter(type_id__in=staged_security_types.keys()).count()
+            SecurityType.objects.bulk_create(
+                staged_security_types.values(), batch_size=500, update_conflicts=True,
+                unique_fields=['type_id'], update_fields=['name', 'last_modified_at'],
+            )
+        created_count = len(staged_security_types) - updated_count
+    except OperationalError: raise # Retried as a whole file by the task decorator
+    except Exception as e:
+        log.error(f"SecurityType Bulk Write: Error writing security types, no changes saved: {e}", exc_info=True)
+        skipped_rows += len(staged_security_types); created_count = 0; updated_count = 0 # Nothing was saved
+
     result_message = f"Imported/Updated SecurityTypes from {os.path.basename(file_path)}. Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_rows}."
     log.info(result_message)
     return file_path # Return path for chaining
@@ -368,7 +483,6 @@ def import_interest_schedules_from_excel(self, file_path):
     """
     log.info(f"Starting InterestSchedule import/update from {file_path}")
     updated_count = 0; created_count = 0; skipped_rows = 0
-    max_retries_per_row = 3; retry_delay = 0.5
 
     # Define expected Excel headers and map to model fields
     header_map = {
@@ -381,17 +495,18 @@ def import_interest_schedules_from_excel(self, file_path):
     mandatory_internal_names = ['schedule_code', 'name'] # Both code and name are required
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"InterestSchedule file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening InterestSchedule file {file_path}: {e}", exc_info=True); raise
 
     # Read actual headers and map
-    excel_headers = [str(cell.value).strip() if cell.value else None for cell in ws[1]]
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    excel_headers = [str(value).strip() if value else None for value in header_row]
     col_idx_map = {}
     processed_excel_headers = []
     for idx, excel_header in enumerate(excel_headers):
         if excel_header:
-            normalized_header = excel_header.lower().replace(' ', '_')
+            normalized_header = normalize_header(excel_header)
             internal_name = header_map.get(normalized_header)
             if internal_name:
                 col_idx_map[internal_name] = idx
@@ -409,34 +524,28 @@ def import_interest_schedules_from_excel(self, file_path):
         wb.close()
         raise ValueError(f"Mandatory InterestSchedule headers missing: {missing_mandatory}")
 
+    # Column positions are resolved once; rows are unpacked by index instead of via a per-row dict
+    max_col = max(col_idx_map.values()) + 1 # Cells right of the last mapped column are never read
+    extract_schedule_fields = build_row_extractor(col_idx_map, ('schedule_code', 'name', 'payments_per_year_default', 'description'))
+    staged_schedules = {} # {schedule_code: unsaved InterestSchedule}; a later row for a code replaces the earlier one
+
     # Iterate through rows
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        raw_data = {}
-        for internal_name, col_idx in col_idx_map.items():
-            if col_idx < len(row): raw_data[internal_name] = row[col_idx]
-            else: raw_data[internal_name] = None
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
+        schedule_code_raw, name_raw, ppy_default_raw, description_raw = extract_schedule_fields(row)
 
         # --- Data Extraction and Cleaning ---
-        schedule_code = raw_data.get('schedule_code')
+        schedule_code = clean_string(schedule_code_raw) # Keep as string; stripped once, then checked
         if not schedule_code: log.warning(f"InterestSchedule Row {row_idx}: Skip missing int_sched."); skipped_rows += 1; continue
-        schedule_code = str(schedule_code).strip() # Keep as string
 
-        name = str(raw_data.get('name', '')).strip()
+        name = clean_string(name_raw)
         if not name: log.warning(f"InterestSchedule Row {row_idx} Code {schedule_code}: Skip missing meaning/name."); skipped_rows += 1; continue
 
         # Optional fields
-        ppy_default_raw = raw_data.get('payments_per_year_default')
-        ppy_default = clean_decimal(ppy_default_raw)
-        ppy_default_int = None
-        if ppy_default is not None:
-            try:
-                 ppy_default_int = int(ppy_default)
-                 if ppy_default_int <= 0: # Validate positive
-                      log.warning(f"InterestSchedule Row {row_idx} Code {schedule_code}: Invalid ppy_default '{ppy_default_raw}'. Setting to NULL."); ppy_default_int = None
-            except (ValueError, TypeError):
-                 log.warning(f"InterestSchedule Row {row_idx} Code {schedule_code}: Could not convert ppy_default '{ppy_default_raw}' to integer. Setting to NULL."); ppy_default_int = None
-
-        description = str(raw_data.get('description', '')).strip() or None
+        ppy_default_int = clean_integer(ppy_default_raw)
+        if ppy_default_int is not None and ppy_default_int <= 0: # Validate positive
+            log.warning(f"InterestSchedule Row {row_idx} Code {schedule_code}: Invalid ppy_default '{ppy_default_raw}'. Setting to NULL."); ppy_default_int = None
+
+        description = clean_string(description_raw) or None
 
         # Prepare defaults dictionary
         data_defaults = {
@@ -446,30 +555,28 @@ def import_interest_schedules_from_excel(self, file_path):
         }
         data_defaults = {k: v for k, v in data_defaults.items() if v is not None}
 
-        # --- Database Operation ---
-        retries = 0; success = False
-        while retries < max_retries_per_row and not success:
-            try:
-                with transaction.atomic():
-                    isc, created = InterestSchedule.objects.update_or_create(
-                        schedule_code=schedule_code, # Match based on PK
-                        defaults=data_defaults
-                    )
-                success = True
-                if created: created_count += 1; log.debug(f"InterestSchedule Row {row_idx}: Created: {schedule_code}")
-                else: updated_count += 1; log.debug(f"InterestSchedule Row {row_idx}: Updated: {schedule_code}")
-            except OperationalError as e:
-                if 'database is locked' in str(e).lower() and retries < max_retries_per_row - 1:
-                    retries += 1; wait_time = retry_delay * (2**retries); log.warning(f"InterestSchedule Row {row_idx}: DB locked {schedule_code}. Retry {retries}/{max_retries_per_row-1} in {wait_time:.2f}s"); time.sleep(wait_time)
-                else:
-                    log.error(f"InterestSchedule Row {row_idx}: OpError {schedule_code} retries {retries}: {e}")
-                    if retries >= max_retries_per_row -1: self.retry(exc=e)
-                    skipped_rows += 1; break
-            except IntegrityError as e: # Could happen on schedule_code or name (if unique=True wasn't removed from name)
-                log.error(f"InterestSchedule Row {row_idx}: IntegrityError {schedule_code}: {e}"); skipped_rows += 1; break
-            except Exception as e: log.error(f"InterestSchedule Row {row_idx}: Error {schedule_code}: {e}", exc_info=True); skipped_rows += 1; break
+        staged_schedules[schedule_code] = InterestSchedule(schedule_code=schedule_code, **data_defaults)
+        log.debug("InterestSchedule Row %s: Staged: %s", row_idx, schedule_code)
 
     wb.close()
+
+    # --- Database Operation ---
+    # One INSERT ... ON CONFLICT (schedule_code) DO UPDATE per batch, in a single transaction. Only the name is
+    # overwritten: ppy_default and description have no mapped columns, so existing values are kept.
+    # A locked database (OperationalError) propagates; autoretry_for on the task reruns the file.
+    try:
+        with transaction.atomic():
+            updated_count = InterestSchedule.objects.filter(schedule_code__in=staged_schedules.keys()).count()
+            InterestSchedule.objects.bulk_create(
+                staged_schedules.values(), batch_size=500, update_conflicts=True,
+                unique_fields=['schedule_code'], update_fields=['name', 'last_modified_at'],
+            )
+        created_count = len(staged_schedules) - updated_count
+    except OperationalError: raise # Retried as a whole file by the task decorator
+    except Exception as e:
+        log.error(f"InterestSchedule Bulk Write: Error writing interest schedules, no changes saved: {e}", exc_info=True)
+        skipped_rows += len(staged_schedules); created_count = 0; updated_count = 0 # Nothing was saved
+
     result_message = f"Imported/Updated InterestSchedules from {os.path.basename(file_path)}. Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_rows}."
     log.info(result_message)
     return file_path # Return path for chaining
@@ -477,8 +584,8 @@ def import_interest_schedules_from_excel(self, file_path):
 # --- Existing Import Tasks (Keep import_securities, import_customers, import_holdings) ---
 # (Code for these tasks remains the same as in the previous version)
 
-@shared_task
-def import_securities_from_excel(file_path):
+@shared_task(bind=True, autoretry_for=(OperationalError,), retry_backoff=5, max_retries=3)
+def import_securities_from_excel(self, file_path):
     """
     Imports or updates securities from an Excel file based on CUSIP (sec_id).
     Maps new Excel columns to the revamped Security model.
@@ -486,7 +593,16 @@ def import_securities_from_excel(file_path):
     """
     log.info(f"Starting security import/update from {file_path}")
     updated_count = 0; created_count = 0; skipped_rows = 0
-    max_retries_per_row = 3; retry_delay = 0.5
+    row_issues = Counter() # {reason: rows}, filled in by log_row_issue
+    bulk_batch_size = 1000
+    # Fields rewritten when an upserted CUSIP already exists (everything in data_defaults, plus the auto_now timestamp)
+    security_update_fields = [
+        'description', 'issue_date', 'maturity_date', 'security_type', 'coupon', 'secondary_rate',
+        'rate_effective_date', 'tax_code', 'interest_schedule', 'interest_day', 'interest_calc_code',
+        'payments_per_year', 'allows_paydown', 'payment_delay_days', 'factor', 'call_date', 'wal', 'cpr',
+        'issuer_name', 'currency', 'callable_flag', 'moody_rating', 'sp_rating', 'fitch_rating', 'sector',
+        'state_of_issuer', 'last_modified_at',
+    ]
 
     # Define expected Excel headers based on validation rules
     # Renaming Excel headers to snake_case for internal use
@@ -527,25 +643,24 @@ def import_securities_from_excel(file_path):
     }
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"Security file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening security file {file_path}: {e}", exc_info=True); raise
 
     # Read actual headers from file and map them using header_map
-    excel_headers = [str(cell.value).strip() if cell.value else None for cell in ws[1]]
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    excel_headers = [str(value).strip() if value else None for value in header_row]
+    # header_map keyed by normalized header, built once so each Excel header is a single dict lookup
+    normalized_header_map = {normalize_header(map_key): map_value for map_key, map_value in header_map.items()}
     # Create a map from normalized internal names to column index { 'cusip': 0, 'security_type_id': 1, ... }
     col_idx_map = {}
     processed_excel_headers = [] # Keep track of headers found in the file
     for idx, excel_header in enumerate(excel_headers):
         if excel_header:
-            normalized_header = excel_header.lower().replace(' ', '_')
+            normalized_header = normalize_header(excel_header)
             # Find the internal name from header_map based on the normalized Excel header
-            internal_name = None
-            for map_key, map_value in header_map.items():
-                # Allow flexible matching (e.g., 'sec_id' or 'sec id' in Excel maps to 'cusip')
-                if normalized_header == map_key.lower().replace(' ', '_'):
-                    internal_name = map_value
-                    break
+            # (flexible matching, e.g. 'sec_id' or 'Sec ID' in Excel maps to 'cusip')
+            internal_name = normalized_header_map.get(normalized_header)
             if internal_name:
                 col_idx_map[internal_name] = idx
                 processed_excel_headers.append(excel_header)
@@ -569,159 +684,164 @@ def import_securities_from_excel(file_path):
         wb.close()
         raise ValueError(f"Mandatory security headers missing: {missing_mandatory}")
 
-    # Pre-fetch related objects for efficiency if possible (might be large)
-    # Caching within the loop might be more memory-efficient for very large files
-    security_types = {st.type_id: st for st in SecurityType.objects.all()}
-    interest_schedules = {isc.schedule_code: isc for isc in InterestSchedule.objects.all()}
+    # Pre-fetch related keys only; type_id and schedule_code are the lookup tables' primary keys,
+    # so a known key is written straight to the foreign key column without loading model instances
+    known_security_type_ids = set(SecurityType.objects.values_list('type_id', flat=True))
+    known_schedule_codes = set(InterestSchedule.objects.values_list('schedule_code', flat=True))
+
+    # Column positions are resolved once; rows are read by index instead of via a per-row dict
+    max_col = max(col_idx_map.values()) + 1 # Cells right of the last mapped column are never read
+    # The CUSIP is read and validated on its own first, so rows without a usable key skip the other 26 fields
+    cusip_idx = col_idx_map['cusip']
+    extract_security_fields = build_row_extractor(col_idx_map, (
+        'security_type_id', 'interest_schedule_code', 'maturity_date', 'issue_date',
+        'rate_effective_date', 'call_date', 'base_rate', 'secondary_rate', 'tax_code', 'interest_calc_code',
+        'prin_paydown_flag', 'factor_from_excel', 'interest_day', 'payments_per_year', 'payment_delay_days',
+        'description', 'issuer_name', 'currency', 'callable_flag_excel', 'moody_rating', 'sp_rating',
+        'fitch_rating', 'sector', 'state_of_issuer', 'wal', 'cpr',
+    ))
+
+    staged_securities = {} # {cusip: unsaved Security}; a later row for a CUSIP replaces the earlier one
 
     # Iterate through rows
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        # Create dictionary using internal names and mapped indices
-        raw_data = {}
-        for internal_name, col_idx in col_idx_map.items():
-            if col_idx < len(row): # Ensure index is within row bounds
-                raw_data[internal_name] = row[col_idx]
-            else:
-                raw_data[internal_name] = None # Assign None if column index exceeds row length
-
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
         # --- Data Extraction and Cleaning ---
-        cusip = raw_data.get('cusip')
-        if not cusip: log.warning(f"Sec Row {row_idx}: Skip missing CUSIP."); skipped_rows += 1; continue
-        cusip = str(cusip).strip().upper()
-        # Basic CUSIP validation (length 9, alphanumeric) - can enhance later
-        if len(cusip) != 9 or not cusip.isalnum():
-            log.warning(f"Sec Row {row_idx}: Invalid CUSIP format '{raw_data.get('cusip')}'. Skipping row.")
+        cusip_raw = row[cusip_idx] if cusip_idx < len(row) else None
+        if not cusip_raw: log_row_issue(row_issues, 'missing_cusip', "Sec Row %s: Skip missing CUSIP.", row_idx); skipped_rows += 1; continue
+        cusip = str(cusip_raw).strip().upper()
+        # Basic CUSIP validation (length 9, A-Z/0-9)
+        if not _CUSIP_MATCH(cusip):
+            log_row_issue(row_issues, 'invalid_cusip', "Sec Row %s: Invalid CUSIP format '%s'. Skipping row.", row_idx, cusip_raw)
             skipped_rows += 1; continue
 
+        (sec_type_id_raw, int_sched_code_raw, maturity_date_raw, issue_date_raw,
+         rate_effective_date_raw, call_date_raw, base_rate_raw, secondary_rate_raw, tax_code_raw, int_calc_code_raw,
+         prin_paydown_flag_raw, factor_raw, interest_day_raw, payments_per_year_raw, payment_delay_days_raw,
+         description_raw, issuer_name_raw, currency_raw, callable_flag_excel, moody_rating_raw, sp_rating_raw,
+         fitch_rating_raw, sector_raw, state_of_issuer_raw, wal_raw, cpr_raw) = extract_security_fields(row)
+
         # Foreign Key Lookups (handle missing related objects)
-        sec_type_id_raw = raw_data.get('security_type_id')
-        sec_type_id = clean_decimal(sec_type_id_raw)
-        security_type_instance = None
-        if sec_type_id is not None:
-            try:
-                sec_type_id_int = int(sec_type_id)
-                security_type_instance = security_types.get(sec_type_id_int)
-                if not security_type_instance:
-                    log.warning(f"Sec Row {row_idx} CUSIP {cusip}: SecurityType ID '{sec_type_id_int}' not found in DB. Setting type to NULL.")
-            except (ValueError, TypeError):
-                 log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid SecurityType ID format '{sec_type_id_raw}'. Setting type to NULL.")
+        sec_type_id_int = clean_integer(sec_type_id_raw)
+        security_type_id = None
+        if sec_type_id_int is not None:
+            if sec_type_id_int in known_security_type_ids:
+                security_type_id = sec_type_id_int
+            else:
+                log_row_issue(row_issues, 'unknown_security_type', "Sec Row %s CUSIP %s: SecurityType ID '%s' not found in DB. Setting type to NULL.", row_idx, cusip, sec_type_id_int)
         # else: log.debug(f"Sec Row {row_idx} CUSIP {cusip}: No SecurityType ID provided.") # Optional: log missing type
 
-        int_sched_code_raw = raw_data.get('interest_schedule_code')
-        interest_schedule_instance = None
+        interest_schedule_id = None
         if int_sched_code_raw:
             int_sched_code = str(int_sched_code_raw).strip()
-            interest_schedule_instance = interest_schedules.get(int_sched_code)
-            if not interest_schedule_instance:
-                 log.warning(f"Sec Row {row_idx} CUSIP {cusip}: InterestSchedule code '{int_sched_code}' not found in DB. Setting schedule to NULL.")
+            if int_sched_code in known_schedule_codes:
+                interest_schedule_id = int_sched_code
+            else:
+                 log_row_issue(row_issues, 'unknown_interest_schedule', "Sec Row %s CUSIP %s: InterestSchedule code '%s' not found in DB. Setting schedule to NULL.", row_idx, cusip, int_sched_code)
         # else: log.debug(f"Sec Row {row_idx} CUSIP {cusip}: No InterestSchedule code provided.") # Optional: log missing schedule
 
         # Date Cleaning
-        maturity_date = clean_date(raw_data.get('maturity_date'))
-        issue_date = clean_date(raw_data.get('issue_date'))
-        rate_effective_date = clean_date(raw_data.get('rate_effective_date'))
-        call_date = clean_date(raw_data.get('call_date')) # Optional call date
+        maturity_date = clean_date(maturity_date_raw, cache_key='securities.maturity_date')
+        issue_date = clean_date(issue_date_raw, cache_key='securities.issue_date')
+        rate_effective_date = clean_date(rate_effective_date_raw, cache_key='securities.rate_effective_date')
+        call_date = clean_date(call_date_raw, cache_key='securities.call_date') # Optional call date
 
         # Validation: Dates required, mat_dt > issue_dt
-        if not maturity_date: log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Missing maturity date. Skipping row."); skipped_rows += 1; continue
-        if not issue_date: log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Missing issue date. Skipping row."); skipped_rows += 1; continue
+        if not maturity_date: log_row_issue(row_issues, 'missing_maturity_date', "Sec Row %s CUSIP %s: Missing maturity date. Skipping row.", row_idx, cusip); skipped_rows += 1; continue
+        if not issue_date: log_row_issue(row_issues, 'missing_issue_date', "Sec Row %s CUSIP %s: Missing issue date. Skipping row.", row_idx, cusip); skipped_rows += 1; continue
         if maturity_date <= issue_date:
-            log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Maturity date ({maturity_date}) not after issue date ({issue_date}). Skipping row.")
+            log_row_issue(row_issues, 'maturity_not_after_issue', "Sec Row %s CUSIP %s: Maturity date (%s) not after issue date (%s). Skipping row.", row_idx, cusip, maturity_date, issue_date)
             skipped_rows += 1; continue
 
         # Rate Calculation
-        base_rate = clean_decimal(raw_data.get('base_rate'), decimal_places=8) # Allow negative
-        secondary_rate = clean_decimal(raw_data.get('secondary_rate'), decimal_places=8) # Allow negative
+        base_rate = clean_decimal(base_rate_raw, decimal_places=8) # Allow negative
+        secondary_rate = clean_decimal(secondary_rate_raw, decimal_places=8) # Allow negative
         effective_coupon = secondary_rate if secondary_rate is not None else base_rate
         # Ensure effective_coupon is not None if base_rate was required (assuming 'rate' column is required)
         # Allow coupon to be None (e.g., Zero Coupon Bonds) - Model allows null=True
         # if effective_coupon is None:
-        #      log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Effective coupon rate could not be determined (rate='{raw_data.get('base_rate')}', secrate_rate='{raw_data.get('secondary_rate')}'). Skipping row.")
+        #      log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Effective coupon rate could not be determined (rate='{base_rate_raw}', secrate_rate='{secondary_rate_raw}'). Skipping row.")
         #      skipped_rows += 1; continue
 
         # Boolean / Choice Cleaning
-        tax_code = str(raw_data.get('tax_code', '')).strip().lower()
-        if tax_code not in ['e', 't']:
-             log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid tax_cd '{raw_data.get('tax_code')}'. Skipping row.")
+        tax_code = clean_string(tax_code_raw).lower()
+        if tax_code not in _TAX_CODES:
+             log_row_issue(row_issues, 'invalid_tax_code', "Sec Row %s CUSIP %s: Invalid tax_cd '%s'. Skipping row.", row_idx, cusip, tax_code_raw)
              skipped_rows += 1; continue
 
-        int_calc_code = str(raw_data.get('interest_calc_code', '')).strip().lower()
-        # Assuming model choices are 'a', 'c', 'h'
-        if int_calc_code not in ['a', 'c', 'h']:
-             log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid int_calc_cd '{raw_data.get('interest_calc_code')}'. Skipping row.")
+        int_calc_code = clean_string(int_calc_code_raw).lower()
+        if int_calc_code not in _INTEREST_CALC_CODES:
+             log_row_issue(row_issues, 'invalid_interest_calc_code', "Sec Row %s CUSIP %s: Invalid int_calc_cd '%s'. Skipping row.", row_idx, cusip, int_calc_code_raw)
              skipped_rows += 1; continue
 
-        prin_paydown_flag_raw = raw_data.get('prin_paydown_flag')
         allows_paydown = clean_boolean_from_char(prin_paydown_flag_raw)
         if allows_paydown is None: # Check if 'y' or 'n' was provided
-             log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid prin_paydown value '{prin_paydown_flag_raw}'. Skipping row.")
+             log_row_issue(row_issues, 'invalid_prin_paydown', "Sec Row %s CUSIP %s: Invalid prin_paydown value '%s'. Skipping row.", row_idx, cusip, prin_paydown_flag_raw)
              skipped_rows += 1; continue
 
         # Factor Logic
-        factor_from_excel = clean_decimal(raw_data.get('factor_from_excel'), decimal_places=10) # Allow negative/ > 1 initially
-        factor = Decimal('1.0') # Default factor
+        factor_from_excel = clean_decimal(factor_raw, decimal_places=10) # Allow negative/ > 1 initially
+        factor = _DEFAULT_FACTOR # Default factor
         if allows_paydown:
             if factor_from_excel is not None:
                  factor = factor_from_excel
             else:
-                 log.warning(f"Sec Row {row_idx} CUSIP {cusip}: prin_paydown is 'y' but factor is missing. Using factor=1.0.")
-        elif factor_from_excel is not None and factor_from_excel != Decimal('1.0'):
-             log.warning(f"Sec Row {row_idx} CUSIP {cusip}: prin_paydown is 'n' but factor '{factor_from_excel}' provided. Ignoring Excel factor, using 1.0.")
+                 log_row_issue(row_issues, 'missing_factor', "Sec Row %s CUSIP %s: prin_paydown is 'y' but factor is missing. Using factor=1.0.", row_idx, cusip)
+        elif factor_from_excel is not None and factor_from_excel != _DEFAULT_FACTOR:
+             log_row_issue(row_issues, 'ignored_factor', "Sec Row %s CUSIP %s: prin_paydown is 'n' but factor '%s' provided. Ignoring Excel factor, using 1.0.", row_idx, cusip, factor_from_excel)
 
         # Integer Cleaning
-        interest_day = clean_decimal(raw_data.get('interest_day')) # Clean as decimal first
+        interest_day = clean_decimal(interest_day_raw) # Clean as decimal first
         if interest_day is None or not (1 <= interest_day <= 31):
-            log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid int_day '{raw_data.get('interest_day')}'. Skipping row.")
+            log_row_issue(row_issues, 'invalid_interest_day', "Sec Row %s CUSIP %s: Invalid int_day '%s'. Skipping row.", row_idx, cusip, interest_day_raw)
             skipped_rows += 1; continue
         interest_day = int(interest_day) # Convert to int after validation
 
-        payments_per_year = clean_decimal(raw_data.get('payments_per_year'))
+        payments_per_year = clean_decimal(payments_per_year_raw)
         if payments_per_year is None or payments_per_year <= 0:
-            log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid ppy '{raw_data.get('payments_per_year')}'. Skipping row.")
+            log_row_issue(row_issues, 'invalid_payments_per_year', "Sec Row %s CUSIP %s: Invalid ppy '%s'. Skipping row.", row_idx, cusip, payments_per_year_raw)
             skipped_rows += 1; continue
         payments_per_year = int(payments_per_year)
 
-        payment_delay_days = clean_decimal(raw_data.get('payment_delay_days'), non_negative=True)
+        payment_delay_days = clean_decimal(payment_delay_days_raw, non_negative=True)
         if payment_delay_days is None:
-            log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Invalid pmt_delay '{raw_data.get('payment_delay_days')}'. Skipping row.")
+            log_row_issue(row_issues, 'invalid_payment_delay', "Sec Row %s CUSIP %s: Invalid pmt_delay '%s'. Skipping row.", row_idx, cusip, payment_delay_days_raw)
             skipped_rows += 1; continue
         payment_delay_days = int(payment_delay_days)
 
         # Optional Fields Cleaning
-        description = str(raw_data.get('description', '')).strip()
-        if not description: log.warning(f"Sec Row {row_idx} CUSIP {cusip}: Missing description. Skipping row."); skipped_rows += 1; continue # Description is required
+        description = clean_string(description_raw)
+        if not description: log_row_issue(row_issues, 'missing_description', "Sec Row %s CUSIP %s: Missing description. Skipping row.", row_idx, cusip); skipped_rows += 1; continue # Description is required
 
-        issuer_name = str(raw_data.get('issuer_name', '')).strip() or None
-        currency = str(raw_data.get('currency', '')).strip().upper() or 'USD'
-        callable_flag_excel = raw_data.get('callable_flag_excel')
+        issuer_name = clean_string(issuer_name_raw) or None
+        currency = clean_string(currency_raw).upper() or 'USD'
         # Set callable_flag based on Excel OR presence of call_date
         callable_flag = clean_boolean_from_char(callable_flag_excel) if callable_flag_excel is not None else (call_date is not None)
 
-        moody_rating = str(raw_data.get('moody_rating', '')).strip() or None
-        sp_rating = str(raw_data.get('sp_rating', '')).strip() or None
-        fitch_rating = str(raw_data.get('fitch_rating', '')).strip() or None
-        sector = str(raw_data.get('sector', '')).strip() or None
-        state_of_issuer = str(raw_data.get('state_of_issuer', '')).strip().upper() or None
-        wal = clean_decimal(raw_data.get('wal'), decimal_places=3, non_negative=True) # Optional WAL
+        moody_rating = clean_string(moody_rating_raw) or None
+        sp_rating = clean_string(sp_rating_raw) or None
+        fitch_rating = clean_string(fitch_rating_raw) or None
+        sector = clean_string(sector_raw) or None
+        state_of_issuer = clean_string(state_of_issuer_raw).upper() or None
+        wal = clean_decimal(wal_raw, decimal_places=3, non_negative=True) # Optional WAL
 
         # *** CLEAN CPR FIELD ***
         # Use decimal_places=5 as defined in the model
-        cpr = clean_decimal(raw_data.get('cpr'), decimal_places=5)
+        cpr = clean_decimal(cpr_raw, decimal_places=5)
         # Add validation if needed (e.g., non-negative)
-        # cpr = clean_decimal(raw_data.get('cpr'), decimal_places=5, non_negative=True)
+        # cpr = clean_decimal(cpr_raw, decimal_places=5, non_negative=True)
         # -----------------------
 
-        # Prepare defaults dictionary for update_or_create
+        # Prepare defaults dictionary for the bulk upsert
         data_defaults = {
             'description': description,
             'issue_date': issue_date,
             'maturity_date': maturity_date,
-            'security_type': security_type_instance, # Assign instance or None
+            'security_type_id': security_type_id, # Known type_id or None
             'coupon': effective_coupon,
             'secondary_rate': secondary_rate,
             'rate_effective_date': rate_effective_date,
             'tax_code': tax_code,
-            'interest_schedule': interest_schedule_instance, # Assign instance or None
+            'interest_schedule_id': interest_schedule_id, # Known schedule_code or None
             'interest_day': interest_day,
             'interest_calc_code': int_calc_code,
             'payments_per_year': payments_per_year,
@@ -746,33 +866,33 @@ def import_securities_from_excel(file_path):
         # Remove keys where value is None IF you don't want to overwrite existing DB values with NULL
         # data_defaults = {k: v for k, v in data_defaults.items() if v is not None} # Decide on this behavior
 
-        # --- Database Operation ---
-        retries = 0; success = False
-        while retries < max_retries_per_row and not success:
-            try:
-                with transaction.atomic():
-                    security, created = Security.objects.update_or_create(
-                        cusip=cusip, # Match based on CUSIP (PK)
-                        defaults=data_defaults
-                    )
-                success = True
-                if created: created_count += 1; log.debug(f"Sec Row {row_idx}: Created Security: {cusip}")
-                else: updated_count += 1; log.debug(f"Sec Row {row_idx}: Updated Security: {cusip}")
-            except OperationalError as e:
-                if 'database is locked' in str(e).lower() and retries < max_retries_per_row - 1:
-                    retries += 1; wait_time = retry_delay * (2**retries); log.warning(f"Sec Row {row_idx}: DB locked {cusip}. Retry {retries}/{max_retries_per_row-1} in {wait_time:.2f}s"); time.sleep(wait_time)
-                else: log.error(f"Sec Row {row_idx}: OpError {cusip} retries {retries}: {e}"); skipped_rows += 1; break
-            except IntegrityError as e: log.error(f"Sec Row {row_idx}: IntegrityError {cusip}: {e}"); skipped_rows += 1; break
-            except Exception as e: log.error(f"Sec Row {row_idx}: Error {cusip}: {e}", exc_info=True); skipped_rows += 1; break
+        staged_securities[cusip] = Security(cusip=cusip, **data_defaults)
+        log.debug("Sec Row %s: Staged Security: %s", row_idx, cusip)
 
     wb.close()
+    log_row_issue_summary("Security Import", row_issues)
+
+    # --- Database Operation ---
+    # One INSERT ... ON CONFLICT (cusip) DO UPDATE per batch, in a single transaction; existing CUSIPs are only counted.
+    # A locked database (OperationalError) propagates; autoretry_for on the task reruns the file.
+    try:
+        with transaction.atomic():
+            updated_count = Security.objects.filter(cusip__in=staged_securities.keys()).count()
+            Security.objects.bulk_create(
+                staged_securities.values(), batch_size=bulk_batch_size, update_conflicts=True,
+                unique_fields=['cusip'], update_fields=security_update_fields,
+            )
+        created_count = len(staged_securities) - updated_count
+    except OperationalError: raise # Retried as a whole file by the task decorator
+    except Exception as e: log.error(f"Error during security import, all changes rolled back: {e}", exc_info=True); raise
+
     result_message = f"Imported/Updated securities from {os.path.basename(file_path)}. Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_rows}."
     log.info(result_message)
     return file_path
 
 
-@shared_task
-def import_customers_from_excel(file_path):
+@shared_task(bind=True, autoretry_for=(OperationalError,), retry_backoff=5, max_retries=3)
+def import_customers_from_excel(self, file_path):
     """
     Imports or updates customers from an Excel file based on cust_num.
     Maps new Excel columns to the revamped Customer model.
@@ -781,7 +901,14 @@ def import_customers_from_excel(file_path):
     log.info(f"Starting customer import/update from {file_path}")
     updated_count = 0; created_count = 0; portfolio_created_count = 0
     portfolio_marked_default_count = 0; skipped_rows = 0
-    max_retries_per_row = 3; retry_delay = 0.5
+    row_issues = Counter() # {reason: rows}, filled in by log_row_issue
+    staged_customers = {} # {cust_num: customer_defaults}
+    bulk_batch_size = 1000
+    # Fields rewritten when an upserted customer_number already exists (everything in customer_defaults, plus the auto_now timestamp)
+    customer_update_fields = [
+        'name', 'city', 'state', 'salesperson', 'portfolio_accounting_code', 'address',
+        'cost_of_funds_rate', 'federal_tax_bracket_rate', 'last_modified_at',
+    ]
 
     # Define expected Excel headers
     header_map = {
@@ -798,17 +925,18 @@ def import_customers_from_excel(file_path):
     }
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"Customer file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening customer file {file_path}: {e}", exc_info=True); raise
 
     # Read actual headers and map to internal names
-    excel_headers = [str(cell.value).strip() if cell.value else None for cell in ws[1]]
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    excel_headers = [str(value).strip() if value else None for value in header_row]
     col_idx_map = {}
     processed_excel_headers = []
     for idx, excel_header in enumerate(excel_headers):
         if excel_header:
-            normalized_header = excel_header.lower().replace(' ', '_')
+            normalized_header = normalize_header(excel_header)
             internal_name = header_map.get(normalized_header) # Direct lookup
             if internal_name:
                 col_idx_map[internal_name] = idx
@@ -828,64 +956,67 @@ def import_customers_from_excel(file_path):
         wb.close()
         raise ValueError(f"Mandatory customer headers missing: {missing_mandatory}")
 
-    # Pre-fetch Salespersons
-    salespersons = {sp.salesperson_id: sp for sp in Salesperson.objects.all()}
+    # Pre-fetch Salesperson keys only; salesperson_id is the primary key, so it is written straight to the FK column
+    known_salesperson_ids = set(Salesperson.objects.values_list('salesperson_id', flat=True))
 
-    # Iterate through rows
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        raw_data = {}
-        for internal_name, col_idx in col_idx_map.items():
-            if col_idx < len(row): raw_data[internal_name] = row[col_idx]
-            else: raw_data[internal_name] = None
+    # Column positions are resolved once; rows are read by index instead of via a per-row dict
+    max_col = max(col_idx_map.values()) + 1 # Cells right of the last mapped column are never read
+    # cust_num is read and validated on its own first, so rows without a usable key skip the other fields
+    customer_number_idx = col_idx_map['customer_number']
+    extract_customer_fields = build_row_extractor(col_idx_map, (
+        'name', 'city', 'state', 'salesperson_id', 'portfolio_accounting_code',
+        'address', 'cost_of_funds_rate', 'federal_tax_bracket_rate',
+    ))
 
+    # Iterate through rows
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
         # --- Data Extraction and Cleaning ---
-        cust_num_raw = raw_data.get('customer_number')
-        customer_number = clean_decimal(cust_num_raw) # Clean as decimal first
-        if customer_number is None: log.warning(f"Cust Row {row_idx}: Skip missing or invalid cust_num '{cust_num_raw}'."); skipped_rows += 1; continue
-        try:
-            customer_number = int(customer_number) # Convert to int
-        except (ValueError, TypeError):
-             log.warning(f"Cust Row {row_idx}: Could not convert cust_num '{cust_num_raw}' to integer. Skipping."); skipped_rows += 1; continue
+        cust_num_raw = row[customer_number_idx] if customer_number_idx < len(row) else None
+        customer_number = clean_integer(cust_num_raw)
+        if customer_number is None: log_row_issue(row_issues, 'invalid_customer_number', "Cust Row %s: Skip missing or invalid cust_num '%s'.", row_idx, cust_num_raw); skipped_rows += 1; continue
 
-        name = str(raw_data.get('name', '')).strip()
-        if not name: log.warning(f"Cust Row {row_idx} CustNum {customer_number}: Missing name. Skipping row."); skipped_rows += 1; continue
+        (name_raw, city_raw, state_raw, slsm_id_raw, portfolio_acc_code_raw,
+         address_raw, cost_funds_raw, fed_tax_raw) = extract_customer_fields(row)
 
-        city = str(raw_data.get('city', '')).strip()
-        if not city: log.warning(f"Cust Row {row_idx} CustNum {customer_number}: Missing city. Skipping row."); skipped_rows += 1; continue
+        name = clean_string(name_raw)
+        if not name: log_row_issue(row_issues, 'missing_name', "Cust Row %s CustNum %s: Missing name. Skipping row.", row_idx, customer_number); skipped_rows += 1; continue
 
-        state = str(raw_data.get('state', '')).strip().upper()
+        city = clean_string(city_raw)
+        if not city: log_row_issue(row_issues, 'missing_city', "Cust Row %s CustNum %s: Missing city. Skipping row.", row_idx, customer_number); skipped_rows += 1; continue
+
+        state = clean_string(state_raw).upper()
         if len(state) != 2: # Basic validation for 2-letter code
-             log.warning(f"Cust Row {row_idx} CustNum {customer_number}: Invalid state '{raw_data.get('state')}'. Skipping row.")
+             log_row_issue(row_issues, 'invalid_state', "Cust Row %s CustNum %s: Invalid state '%s'. Skipping row.", row_idx, customer_number, state_raw)
              skipped_rows += 1; continue
 
-        portfolio_acc_code = str(raw_data.get('portfolio_accounting_code', '')).strip()
-        if not portfolio_acc_code: log.warning(f"Cust Row {row_idx} CustNum {customer_number}: Missing ip_bnk code. Skipping row."); skipped_rows += 1; continue
+        portfolio_acc_code = clean_string(portfolio_acc_code_raw)
+        if not portfolio_acc_code: log_row_issue(row_issues, 'missing_portfolio_accounting_code', "Cust Row %s CustNum %s: Missing ip_bnk code. Skipping row.", row_idx, customer_number); skipped_rows += 1; continue
 
         # Salesperson Lookup
-        slsm_id_raw = raw_data.get('salesperson_id')
-        salesperson_instance = None
+        salesperson_id = None
         if slsm_id_raw is not None:
             slsm_id = str(slsm_id_raw).strip()
-            salesperson_instance = salespersons.get(slsm_id)
-            if not salesperson_instance:
-                 log.warning(f"Cust Row {row_idx} CustNum {customer_number}: Salesperson ID '{slsm_id}' not found in DB. Setting salesperson to NULL.")
+            if slsm_id in known_salesperson_ids:
+                salesperson_id = slsm_id
+            else:
+                 log_row_issue(row_issues, 'unknown_salesperson', "Cust Row %s CustNum %s: Salesperson ID '%s' not found in DB. Setting salesperson to NULL.", row_idx, customer_number, slsm_id)
         else:
-             log.warning(f"Cust Row {row_idx} CustNum {customer_number}: Missing slsm_id. Skipping row.") # Salesperson is required
+             log_row_issue(row_issues, 'missing_salesperson', "Cust Row %s CustNum %s: Missing slsm_id. Skipping row.", row_idx, customer_number) # Salesperson is required
              skipped_rows += 1; continue
 
 
         # Optional Fields
-        address = str(raw_data.get('address', '')).strip() or None
+        address = clean_string(address_raw) or None
         # zip_code removed
-        cost_funds = clean_decimal(raw_data.get('cost_of_funds_rate'), decimal_places=8, non_negative=True)
-        fed_tax = clean_decimal(raw_data.get('federal_tax_bracket_rate'), decimal_places=8, non_negative=True)
+        cost_funds = clean_decimal(cost_funds_raw, decimal_places=8, non_negative=True)
+        fed_tax = clean_decimal(fed_tax_raw, decimal_places=8, non_negative=True)
 
         # Prepare defaults dictionary (zip_code removed)
         customer_defaults = {
             'name': name,
             'city': city,
             'state': state,
-            'salesperson': salesperson_instance, # Assign instance or None
+            'salesperson_id': salesperson_id, # Known salesperson_id or None
             'portfolio_accounting_code': portfolio_acc_code,
             'address': address,
             # 'zip_code': zip_code, # Removed
@@ -895,72 +1026,65 @@ def import_customers_from_excel(file_path):
         # Remove None values if needed, but allow overwriting with NULL for optional fields
         # customer_defaults = {k: v for k, v in customer_defaults.items() if v is not None}
 
-        # --- Database Operation & Portfolio Handling ---
-        retries = 0; success = False; customer = None; customer_created = False
-        portfolio = None; portfolio_created = False; portfolio_updated = False
-        while retries < max_retries_per_row and not success:
-            try:
-                with transaction.atomic():
-                    customer, customer_created = Customer.objects.update_or_create(
-                        customer_number=customer_number, # Match based on unique customer_number
-                        defaults=customer_defaults
-                    )
-                    # Default portfolio logic (remains the same)
-                    portfolio_owner_name = customer.name # Name is required now
-                    portfolio_name = f"{portfolio_owner_name} - Primary Holdings"
-                    portfolio_defaults = {'is_default': True, 'name': portfolio_name}
-                    try:
-                        # Try finding by owner and is_default=True first
-                        portfolio, portfolio_created = Portfolio.objects.get_or_create(
-                            owner=customer, is_default=True, defaults=portfolio_defaults
-                        )
-                        # If found, ensure name matches convention
-                        if not portfolio_created and portfolio.name != portfolio_name:
-                             portfolio.name = portfolio_name
-                             portfolio.save(update_fields=['name'])
-                             portfolio_updated = True # Mark as updated for logging
-                    except IntegrityError:
-                        # This handles the case where a non-default portfolio might exist with the target name
-                        # or multiple defaults somehow exist (violates constraint, but handle defensively)
-                        log.warning(f"Cust Row {row_idx}: IntegrityError finding/creating default portfolio for {customer_number}. Fallback lookup by name.")
-                        # Try getting by name, ensuring it's marked default
-                        portfolio, portfolio_created = Portfolio.objects.get_or_create(
-                            owner=customer, name=portfolio_name, defaults=portfolio_defaults
-                        )
-                        if not portfolio_created and not portfolio.is_default:
-                            # Found by name, but wasn't default. Mark it as default.
-                            portfolio.is_default = True
-                            portfolio.save(update_fields=['is_default'])
-                            portfolio_updated = True # Mark as updated for logging
-                    except Portfolio.MultipleObjectsReturned:
-                         # This means multiple portfolios exist with is_default=True for this owner
-                         log.error(f"CRITICAL: Multiple default portfolios found for customer {customer_number}. Skipping default portfolio handling for this customer.")
-                         portfolio = None # Cannot determine the correct default portfolio
-                         portfolio_created = False
-                         portfolio_updated = False
-
-
-                success = True
-            except OperationalError as e:
-                 if 'database is locked' in str(e).lower() and retries < max_retries_per_row -1:
-                    retries += 1; wait_time = retry_delay * (2**retries); log.warning(f"Cust Row {row_idx}: DB locked {customer_number}. Retry {retries}/{max_retries_per_row-1} in {wait_time:.2f}s"); time.sleep(wait_time)
-                 else: log.error(f"Cust Row {row_idx}: OpError {customer_number} retries {retries}: {e}"); skipped_rows += 1; break
-            except IntegrityError as e: log.error(f"Cust Row {row_idx}: IntegrityError {customer_number}: {e}", exc_info=True); skipped_rows += 1; break
-            # Catch FieldError specifically if zip_code somehow still causes issues
-            except FieldError as fe:
-                log.error(f"Cust Row {row_idx}: Error {customer_number}: {fe}", exc_info=True)
-                skipped_rows += 1; break
-            except Exception as e: log.error(f"Cust Row {row_idx}: Error {customer_number}: {e}", exc_info=True); skipped_rows += 1; break
-
-        # Logging results (remains the same)
-        if success:
-             if customer_created: created_count += 1; log.debug(f"Cust Row {row_idx}: Created Customer: {customer_number}")
-             else: updated_count += 1; log.debug(f"Cust Row {row_idx}: Updated Customer: {customer_number}")
-             if portfolio: # Only log if portfolio handling was successful
-                 if portfolio_created: portfolio_created_count += 1; log.debug(f"Cust Row {row_idx}: Created default Portfolio '{portfolio.name}' for Customer: {customer_number}")
-                 elif portfolio_updated: portfolio_marked_default_count += 1; log.debug(f"Cust Row {row_idx}: Marked/Updated default Portfolio '{portfolio.name}' for Customer: {customer_number}")
+        # --- Stage customer for bulk write (later rows for a cust_num win, as with update_or_create) ---
+        staged_customers[customer_number] = customer_defaults
 
     wb.close()
+    log_row_issue_summary("Customer Import", row_issues)
+
+    # --- Bulk upsert customers ---
+    # A locked database (OperationalError) propagates; autoretry_for on the task reruns the file.
+    # One INSERT ... ON CONFLICT (customer_number) DO UPDATE per batch; existing numbers are only fetched for the counts
+    existing_customer_numbers = set(Customer.objects.filter(
+        customer_number__in=staged_customers.keys()
+    ).values_list('customer_number', flat=True))
+    customers_to_upsert = [
+        Customer(customer_number=customer_number, **customer_defaults)
+        for customer_number, customer_defaults in staged_customers.items()
+    ]
+    log.info(f"Customer Bulk Write: Upserting {len(customers_to_upsert)} customers ({len(existing_customer_numbers)} already exist)...")
+
+    try:
+        with transaction.atomic():
+            Customer.objects.bulk_create(
+                customers_to_upsert, batch_size=bulk_batch_size, update_conflicts=True,
+                unique_fields=['customer_number'], update_fields=customer_update_fields,
+            )
+            updated_count = len(existing_customer_numbers); created_count = len(customers_to_upsert) - updated_count
+
+            # --- Default Portfolio Handling ---
+            # Every imported customer gets one default portfolio named after it
+            customer_names_by_id = dict(Customer.objects.filter(
+                customer_number__in=staged_customers.keys()
+            ).values_list('id', 'name'))
+            # Only the columns checked or renamed below are loaded; bulk_update writes just 'name'
+            default_portfolios = list(Portfolio.objects.filter(
+                owner_id__in=customer_names_by_id.keys(), is_default=True
+            ).only('id', 'owner_id', 'name'))
+            default_portfolio_counts = Counter(p.owner_id for p in default_portfolios)
+            portfolios_to_create = []; portfolios_to_rename = []
+            for portfolio in default_portfolios:
+                if default_portfolio_counts[portfolio.owner_id] > 1: continue # Reported below
+                portfolio_name = f"{customer_names_by_id[portfolio.owner_id]} - Primary Holdings"
+                if portfolio.name != portfolio_name: # Ensure name matches convention
+                    portfolio.name = portfolio_name
+                    portfolios_to_rename.append(portfolio)
+            for owner_id, owner_name in customer_names_by_id.items():
+                if default_portfolio_counts[owner_id] > 1:
+                    # This means multiple portfolios exist with is_default=True for this owner
+                    log.error(f"CRITICAL: Multiple default portfolios found for customer id {owner_id}. Skipping default portfolio handling for this customer.")
+                elif owner_id not in default_portfolio_counts:
+                    portfolios_to_create.append(Portfolio(owner_id=owner_id, name=f"{owner_name} - Primary Holdings", is_default=True))
+            Portfolio.objects.bulk_create(portfolios_to_create, batch_size=bulk_batch_size)
+            Portfolio.objects.bulk_update(portfolios_to_rename, ['name'], batch_size=bulk_batch_size)
+            portfolio_created_count = len(portfolios_to_create); portfolio_marked_default_count = len(portfolios_to_rename)
+    except OperationalError: raise # Rolled back; retried as a whole file by the task decorator
+    except Exception as e:
+        # The transaction was rolled back, so none of the staged customers were saved
+        log.error(f"Customer Bulk Write: Error writing customers, no changes saved: {e}", exc_info=True)
+        skipped_rows += len(staged_customers)
+        created_count = 0; updated_count = 0; portfolio_created_count = 0; portfolio_marked_default_count = 0
+
     result_message = (f"Imported/Updated customers from {os.path.basename(file_path)}. "
                       f"Customers Created: {created_count}, Updated: {updated_count}. "
                       f"Default Portfolios Created: {portfolio_created_count}, "
@@ -980,10 +1104,16 @@ def import_holdings_from_excel(self, file_path):
     """
     log.info(f"Starting holding import/update (Primary Portfolio Only) from {file_path}")
     updated_count = 0; created_count = 0; deleted_count = 0; skipped_rows = 0
-    # Stores {customer_id: set(external_ticket)} processed from the file
-    processed_tickets_in_default_portfolio = {}
-
-    max_retries_per_row = 3; retry_delay = 0.5
+    row_issues = Counter() # {reason: rows}, filled in by log_row_issue
+    # Stores (default_portfolio_id, external_ticket) pairs processed from the file
+    processed_holding_keys = set()
+    bulk_batch_size = 1000
+    # Fields rewritten when an upserted ticket already exists (everything in holding_defaults, plus the auto_now timestamp)
+    holding_update_fields = [
+        'portfolio', 'security', 'intention_code', 'original_face_amount', 'settlement_date',
+        'settlement_price', 'book_price', 'book_yield', 'holding_duration', 'holding_average_life',
+        'holding_average_life_date', 'market_date', 'market_price', 'market_yield', 'last_modified_at',
+    ]
 
     # Define expected Excel headers
     header_map = {
@@ -1006,17 +1136,18 @@ def import_holdings_from_excel(self, file_path):
     }
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"Holding import file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening holding import file {file_path}: {e}", exc_info=True); raise
 
     # Read actual headers and map to internal names
-    excel_headers = [str(cell.value).strip() if cell.value else None for cell in ws[1]]
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    excel_headers = [str(value).strip() if value else None for value in header_row]
     col_idx_map = {}
     processed_excel_headers = []
     for idx, excel_header in enumerate(excel_headers):
         if excel_header:
-            normalized_header = excel_header.lower().replace(' ', '_')
+            normalized_header = normalize_header(excel_header)
             internal_name = header_map.get(normalized_header)
             if internal_name:
                 col_idx_map[internal_name] = idx
@@ -1038,104 +1169,118 @@ def import_holdings_from_excel(self, file_path):
         wb.close()
         raise ValueError(f"Mandatory holding headers missing: {missing_mandatory}")
 
-    # --- Caching ---
-    customer_cache = {} # {cust_num: customer_instance}
-    security_cache = {} # {cusip: security_instance}
-    default_portfolio_cache = {} # {customer_id: portfolio_instance_or_None}
+    # --- Pre-scan: collect lookup keys so related rows can be fetched in bulk ---
+    max_col = max(col_idx_map.values()) + 1 # Cells right of the last mapped column are never read
+    extract_key_fields = build_row_extractor(col_idx_map, ('external_ticket', 'customer_number', 'cusip'))
+    external_tickets = set(); customer_numbers = set(); cusips = set()
+    for row in ws.iter_rows(min_row=2, max_col=max_col, values_only=True):
+        ticket_raw, cust_num_raw, cusip_raw = extract_key_fields(row)
+        # Same parser as Pass 1, so every key Pass 1 accepts is prefetched; invalid values are reported in Pass 1
+        external_ticket = clean_integer(ticket_raw, quiet=True)
+        if external_ticket is not None: external_tickets.add(external_ticket)
+        customer_number = clean_integer(cust_num_raw, quiet=True)
+        if customer_number is not None: customer_numbers.add(customer_number)
+        if cusip_raw: cusips.add(str(cusip_raw).strip().upper())
+
+    # --- Caching (one query per related model instead of one per row) ---
+    # Only keys are cached, as plain tuples; holdings are built from foreign key ids, so no model instances are needed
+    customer_id_cache = dict(Customer.objects.filter(
+        customer_number__in=customer_numbers
+    ).values_list('customer_number', 'id')) # {cust_num: customer_id}
+    # cusip is Security's primary key, so it doubles as the holding's security_id
+    known_cusips = set(Security.objects.filter(cusip__in=cusips).values_list('cusip', flat=True))
+    default_portfolios = list(Portfolio.objects.filter(
+        owner_id__in=customer_id_cache.values(), is_default=True
+    ).values_list('owner_id', 'id', 'name'))
+    default_portfolio_counts = Counter(owner_id for owner_id, _, _ in default_portfolios)
+    customer_numbers_by_id = {customer_id: cust_num for cust_num, customer_id in customer_id_cache.items()}
+    # {cust_num: (portfolio_id, portfolio_name) or None}, keyed like customer_id_cache; None marks customers with multiple default portfolios
+    default_portfolio_cache = {
+        customer_numbers_by_id[owner_id]: ((portfolio_id, name) if default_portfolio_counts[owner_id] == 1 else None)
+        for owner_id, portfolio_id, name in default_portfolios
+    }
+    # Tickets already in the DB; only used to report created vs updated counts
+    existing_tickets = set(CustomerHolding.objects.filter(
+        external_ticket__in=external_tickets
+    ).values_list('external_ticket', flat=True))
+    log.info(f"Holding Import: Prefetched {len(customer_id_cache)} customers, {len(known_cusips)} securities, "
+             f"{len(default_portfolios)} default portfolios, {len(existing_tickets)} existing holdings.")
+    staged_holdings = {} # {external_ticket: unsaved CustomerHolding}; later rows for a ticket replace earlier ones
+
+    # Column positions are resolved once; rows are read by index instead of via a per-row dict
+    # The ticket is read and validated on its own first, so rows without a usable key skip the other fields
+    external_ticket_idx = col_idx_map['external_ticket']
+    extract_holding_fields = build_row_extractor(col_idx_map, (
+        'customer_number', 'cusip', 'intention_code', 'original_face_amount',
+        'settlement_date', 'settlement_price', 'book_price', 'book_yield', 'holding_duration',
+        'holding_average_life', 'holding_average_life_date', 'market_date', 'market_price', 'market_yield',
+    ))
 
     # --- First Pass: Process rows, update/create holdings in DEFAULT portfolio ---
     log.info("Holdings Pass 1: Updating/Creating holdings in default portfolios...")
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-        raw_data = {}
-        for internal_name, col_idx in col_idx_map.items():
-            if col_idx < len(row): raw_data[internal_name] = row[col_idx]
-            else: raw_data[internal_name] = None
-
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
         # --- Data Extraction and Cleaning ---
-        ext_ticket_raw = raw_data.get('external_ticket')
-        external_ticket = clean_decimal(ext_ticket_raw)
-        if external_ticket is None: log.warning(f"Hold Row {row_idx}: Skip missing or invalid ticket '{ext_ticket_raw}'."); skipped_rows += 1; continue
-        try:
-            external_ticket = int(external_ticket)
-        except (ValueError, TypeError):
-            log.warning(f"Hold Row {row_idx}: Could not convert ticket '{ext_ticket_raw}' to integer. Skipping."); skipped_rows += 1; continue
+        ext_ticket_raw = row[external_ticket_idx] if external_ticket_idx < len(row) else None
+        external_ticket = clean_integer(ext_ticket_raw)
+        if external_ticket is None: log_row_issue(row_issues, 'invalid_ticket', "Hold Row %s: Skip missing or invalid ticket '%s'.", row_idx, ext_ticket_raw); skipped_rows += 1; continue
 
-        cust_num_raw = raw_data.get('customer_number')
-        customer_number = clean_decimal(cust_num_raw)
-        if customer_number is None: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Skip missing or invalid cust_num '{cust_num_raw}'."); skipped_rows += 1; continue
-        try:
-            customer_number = int(customer_number)
-        except (ValueError, TypeError):
-            log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Could not convert cust_num '{cust_num_raw}' to integer. Skipping."); skipped_rows += 1; continue
+        (cust_num_raw, cusip_raw, intention_code_raw, orig_face_raw,
+         settle_dt_raw, set_price_raw, book_price_raw, book_yield_raw, hold_duration_raw,
+         hold_avg_life_raw, hold_avg_life_dt_raw, mkt_dt_raw, mkt_price_raw, mkt_yield_raw) = extract_holding_fields(row)
+
+        customer_number = clean_integer(cust_num_raw)
+        if customer_number is None: log_row_issue(row_issues, 'invalid_customer_number', "Hold Row %s Ticket %s: Skip missing or invalid cust_num '%s'.", row_idx, external_ticket, cust_num_raw); skipped_rows += 1; continue
 
-        cusip_raw = raw_data.get('cusip')
-        if not cusip_raw: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Skip missing cusip."); skipped_rows += 1; continue
+        if not cusip_raw: log_row_issue(row_issues, 'missing_cusip', "Hold Row %s Ticket %s: Skip missing cusip.", row_idx, external_ticket); skipped_rows += 1; continue
         cusip = str(cusip_raw).strip().upper()
         # Basic CUSIP validation
-        if len(cusip) != 9 or not cusip.isalnum():
-            log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Invalid CUSIP format '{cusip_raw}'. Skipping row.")
+        if not _CUSIP_MATCH(cusip):
+            log_row_issue(row_issues, 'invalid_cusip', "Hold Row %s Ticket %s: Invalid CUSIP format '%s'. Skipping row.", row_idx, external_ticket, cusip_raw)
             skipped_rows += 1; continue
 
-        # --- Get Customer (use cache) ---
-        customer = customer_cache.get(customer_number)
-        if not customer:
-            try:
-                customer = Customer.objects.get(customer_number=customer_number)
-                customer_cache[customer_number] = customer
-            except Customer.DoesNotExist: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Skip unknown customer_number {customer_number}"); skipped_rows += 1; continue
-            except Exception as e: log.error(f"Hold Row {row_idx} Ticket {external_ticket}: Error fetch customer {customer_number}: {e}"); skipped_rows += 1; continue
-
-        # --- Get Security (use cache) ---
-        security = security_cache.get(cusip)
-        if not security:
-            try:
-                security = Security.objects.get(cusip=cusip)
-                security_cache[cusip] = security
-            except Security.DoesNotExist: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Skip unknown cusip {cusip}"); skipped_rows += 1; continue
-            except Exception as e: log.error(f"Hold Row {row_idx} Ticket {external_ticket}: Error fetch security {cusip}: {e}"); skipped_rows += 1; continue
-
-        # --- Get Default Portfolio (use cache) ---
-        default_portfolio = default_portfolio_cache.get(customer.id)
-        if customer.id not in default_portfolio_cache: # Check cache first
-            try:
-                default_portfolio = Portfolio.objects.get(owner=customer, is_default=True)
-                default_portfolio_cache[customer.id] = default_portfolio
-            except Portfolio.DoesNotExist: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Default portfolio not found for customer {customer_number}. Skipping."); default_portfolio_cache[customer.id] = None; skipped_rows += 1; continue
-            except Portfolio.MultipleObjectsReturned: log.error(f"Hold Row {row_idx} Ticket {external_ticket}: CRITICAL - Multiple default portfolios found for customer {customer_number}. Skipping."); default_portfolio_cache[customer.id] = None; skipped_rows += 1; continue
-            except Exception as e: log.error(f"Hold Row {row_idx} Ticket {external_ticket}: Error fetch default portfolio for {customer_number}: {e}"); default_portfolio_cache[customer.id] = None; skipped_rows += 1; continue
-        if default_portfolio is None: skipped_rows += 1; continue # Skip if default portfolio known not to exist
+        # --- Get Customer (prefetched) ---
+        if customer_number not in customer_id_cache: log_row_issue(row_issues, 'unknown_customer', "Hold Row %s Ticket %s: Skip unknown customer_number %s", row_idx, external_ticket, customer_number); skipped_rows += 1; continue
+
+        # --- Get Security (prefetched) ---
+        if cusip not in known_cusips: log_row_issue(row_issues, 'unknown_cusip', "Hold Row %s Ticket %s: Skip unknown cusip %s", row_idx, external_ticket, cusip); skipped_rows += 1; continue
+
+        # --- Get Default Portfolio (prefetched) ---
+        if customer_number not in default_portfolio_cache: log_row_issue(row_issues, 'missing_default_portfolio', "Hold Row %s Ticket %s: Default portfolio not found for customer %s. Skipping.", row_idx, external_ticket, customer_number); skipped_rows += 1; continue
+        default_portfolio_info = default_portfolio_cache[customer_number]
+        if default_portfolio_info is None: log.error(f"Hold Row {row_idx} Ticket {external_ticket}: CRITICAL - Multiple default portfolios found for customer {customer_number}. Skipping."); skipped_rows += 1; continue
+        default_portfolio_id, default_portfolio_name = default_portfolio_info
 
         # --- Clean Remaining Fields ---
-        intention_code = str(raw_data.get('intention_code', '')).strip().upper()
-        if intention_code not in ['A', 'M', 'T']: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Invalid lc_xf1_cd '{raw_data.get('intention_code')}'. Skipping row."); skipped_rows += 1; continue
+        intention_code = clean_string(intention_code_raw).upper()
+        if intention_code not in _INTENTION_CODES: log_row_issue(row_issues, 'invalid_intention_code', "Hold Row %s Ticket %s: Invalid lc_xf1_cd '%s'. Skipping row.", row_idx, external_ticket, intention_code_raw); skipped_rows += 1; continue
 
-        orig_face = clean_decimal(raw_data.get('original_face_amount'), decimal_places=8, non_negative=True)
-        if orig_face is None: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Invalid orig_face '{raw_data.get('original_face_amount')}'. Skipping row."); skipped_rows += 1; continue
+        orig_face = clean_decimal(orig_face_raw, decimal_places=8, non_negative=True)
+        if orig_face is None: log_row_issue(row_issues, 'invalid_original_face', "Hold Row %s Ticket %s: Invalid orig_face '%s'. Skipping row.", row_idx, external_ticket, orig_face_raw); skipped_rows += 1; continue
 
-        settle_dt = clean_date(raw_data.get('settlement_date'))
-        if settle_dt is None: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Invalid settle_dt '{raw_data.get('settlement_date')}'. Skipping row."); skipped_rows += 1; continue
+        settle_dt = clean_date(settle_dt_raw, cache_key='holdings.settlement_date')
+        if settle_dt is None: log_row_issue(row_issues, 'invalid_settlement_date', "Hold Row %s Ticket %s: Invalid settle_dt '%s'. Skipping row.", row_idx, external_ticket, settle_dt_raw); skipped_rows += 1; continue
 
-        set_price = clean_decimal(raw_data.get('settlement_price'), decimal_places=8, non_negative=True)
-        if set_price is None: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Invalid set_price '{raw_data.get('settlement_price')}'. Skipping row."); skipped_rows += 1; continue
+        set_price = clean_decimal(set_price_raw, decimal_places=8, non_negative=True)
+        if set_price is None: log_row_issue(row_issues, 'invalid_settlement_price', "Hold Row %s Ticket %s: Invalid set_price '%s'. Skipping row.", row_idx, external_ticket, set_price_raw); skipped_rows += 1; continue
 
-        book_price = clean_decimal(raw_data.get('book_price'), decimal_places=8, non_negative=True)
-        if book_price is None: log.warning(f"Hold Row {row_idx} Ticket {external_ticket}: Invalid book_price '{raw_data.get('book_price')}'. Skipping row."); skipped_rows += 1; continue
+        book_price = clean_decimal(book_price_raw, decimal_places=8, non_negative=True)
+        if book_price is None: log_row_issue(row_issues, 'invalid_book_price', "Hold Row %s Ticket %s: Invalid book_price '%s'. Skipping row.", row_idx, external_ticket, book_price_raw); skipped_rows += 1; continue
 
         # Optional fields
-        book_yield = clean_decimal(raw_data.get('book_yield'), decimal_places=8, non_negative=True)
-        hold_duration = clean_decimal(raw_data.get('holding_duration'), decimal_places=8, non_negative=True)
-        hold_avg_life = clean_decimal(raw_data.get('holding_average_life'), decimal_places=8, non_negative=True)
-        hold_avg_life_dt = clean_date(raw_data.get('holding_average_life_date'))
-        mkt_dt = clean_date(raw_data.get('market_date'))
-        mkt_price = clean_decimal(raw_data.get('market_price'), decimal_places=8, non_negative=True)
-        mkt_yield = clean_decimal(raw_data.get('market_yield'), decimal_places=8, non_negative=True)
+        book_yield = clean_decimal(book_yield_raw, decimal_places=8, non_negative=True)
+        hold_duration = clean_decimal(hold_duration_raw, decimal_places=8, non_negative=True)
+        hold_avg_life = clean_decimal(hold_avg_life_raw, decimal_places=8, non_negative=True)
+        hold_avg_life_dt = clean_date(hold_avg_life_dt_raw, cache_key='holdings.holding_average_life_date')
+        mkt_dt = clean_date(mkt_dt_raw, cache_key='holdings.market_date')
+        mkt_price = clean_decimal(mkt_price_raw, decimal_places=8, non_negative=True)
+        mkt_yield = clean_decimal(mkt_yield_raw, decimal_places=8, non_negative=True)
 
         # --- Prepare holding data defaults ---
         # Include external_ticket in defaults now
         holding_defaults = {
             # 'external_ticket': external_ticket, # Don't update external_ticket, use it for lookup only
-            'portfolio': default_portfolio, # Link to the specific default portfolio
-            'security': security,
+            'portfolio_id': default_portfolio_id, # Link to the specific default portfolio
+            'security_id': cusip,
             'intention_code': intention_code,
             'original_face_amount': orig_face,
             'settlement_date': settle_dt,
@@ -1152,77 +1297,63 @@ def import_holdings_from_excel(self, file_path):
         # Remove None values if needed
         # holding_defaults = {k: v for k, v in holding_defaults.items() if v is not None}
 
-        # --- Database Operation (Update/Create based on external_ticket) ---
-        retries = 0; success = False
-        while retries < max_retries_per_row and not success:
-            try:
-                with transaction.atomic():
-                    # Use external_ticket as the unique key for finding/updating holdings
-                    holding, created = CustomerHolding.objects.update_or_create(
-                        external_ticket=external_ticket, # Match on external ticket
-                        defaults=holding_defaults # Update all other fields
-                    )
-                success = True
-                # Track processed external tickets *for this customer's default portfolio*
-                if customer.id not in processed_tickets_in_default_portfolio:
-                     processed_tickets_in_default_portfolio[customer.id] = set()
-                # Still track the external ticket from the file for the deletion phase
-                processed_tickets_in_default_portfolio[customer.id].add(external_ticket)
-
-                if created: created_count += 1; log.debug(f"Hold Row {row_idx}: Created Holding Ticket {external_ticket} for Sec {cusip} in '{default_portfolio.name}'")
-                else: updated_count += 1; log.debug(f"Hold Row {row_idx}: Updated Holding Ticket {external_ticket} for Sec {cusip} in '{default_portfolio.name}'")
-
-            except OperationalError as e:
-                 # Let celery handle retry based on task decorator
-                 log.warning(f"Hold Row {row_idx}: DB locked for holding ticket {external_ticket}. Celery will retry...")
-                 self.retry(exc=e) # Trigger Celery's retry mechanism
-                 # Note: If retry fails max times, task fails. Need error handling strategy.
-                 # For now, just log and let it fail if lock persists.
-                 log.error(f"Hold Row {row_idx}: DB lock persisted for holding ticket {external_ticket}. Task may fail.")
-                 skipped_rows += 1; break # Break local loop after triggering retry
-            except IntegrityError as e:
-                # This might catch UNIQUE constraint on external_ticket if it's somehow duplicated
-                # or if portfolio+security constraint was re-added accidentally.
-                log.error(f"Hold Row {row_idx}: IntegrityError on holding ticket {external_ticket} (Port: {default_portfolio.id}, Sec: {cusip}): {e}", exc_info=True)
-                skipped_rows += 1; break
-            except Exception as e:
-                log.error(f"Hold Row {row_idx}: Unexpected error on holding ticket {external_ticket}: {e}", exc_info=True)
-                skipped_rows += 1; break
-
-    # --- Second Pass: Delete obsolete holdings from relevant DEFAULT portfolios ---
-    log.info("Holdings Pass 2: Deleting obsolete holdings from default portfolios...")
-    all_processed_tickets = set()
-    for ticket_set in processed_tickets_in_default_portfolio.values():
-        all_processed_tickets.update(ticket_set)
-
-    # Find all customers who had holdings processed in this run
-    customers_to_check_ids = list(processed_tickets_in_default_portfolio.keys())
-    if customers_to_check_ids:
-        # Get all default portfolios for these customers
-        relevant_default_portfolios = Portfolio.objects.filter(
-            owner_id__in=customers_to_check_ids,
-            is_default=True
-        )
-        # Find holdings in these default portfolios whose external_ticket is NOT in the set we just processed
-        obsolete_holdings_qs = CustomerHolding.objects.filter(
-            portfolio__in=relevant_default_portfolios
-        ).exclude(
-            external_ticket__in=all_processed_tickets
-        )
-
-        try:
-            # Perform deletion in bulk
-            deleted_count, deleted_details = obsolete_holdings_qs.delete()
-            if deleted_count > 0:
-                log.info(f"Holdings Deletion: Deleted {deleted_count} obsolete holdings from relevant default portfolios. Details: {deleted_details}")
-        except Exception as e:
-             log.error(f"Holdings Deletion: Error deleting obsolete holdings: {e}", exc_info=True)
-             # Decide on error handling - stop task? Log and continue?
-    else:
-         log.info("Holdings Deletion: No customers had holdings processed, skipping deletion phase.")
+        # --- Stage holding for bulk upsert (keyed on external_ticket) ---
+        if external_ticket in existing_tickets or external_ticket in staged_holdings:
+            updated_count += 1; log.debug("Hold Row %s: Staged update to Holding Ticket %s for Sec %s in '%s'", row_idx, external_ticket, cusip, default_portfolio_name)
+        else:
+            created_count += 1; log.debug("Hold Row %s: Staged new Holding Ticket %s for Sec %s in '%s'", row_idx, external_ticket, cusip, default_portfolio_name)
+        staged_holdings[external_ticket] = CustomerHolding(external_ticket=external_ticket, **holding_defaults)
 
+        # Track processed external tickets *for this customer's default portfolio* (for the deletion phase)
+        processed_holding_keys.add((default_portfolio_id, external_ticket))
 
     wb.close()
+    log_row_issue_summary("Holding Import", row_issues)
+
+    # --- Bulk upsert staged holdings, then delete obsolete holdings from the DEFAULT portfolios ---
+    # Both steps share one transaction, so readers never see new holdings next to ones the file dropped,
+    # and a failure in either step leaves the holdings exactly as they were.
+    # One INSERT ... ON CONFLICT (external_ticket) DO UPDATE per batch; last_modified_at is set by auto_now on insert.
+    # A locked database (OperationalError) propagates; autoretry_for on the task reruns the file.
+    log.info(f"Holdings Bulk Write: Upserting {len(staged_holdings)} holdings ({created_count} new, {updated_count} updated rows)...")
+    try:
+        with transaction.atomic():
+            CustomerHolding.objects.bulk_create(
+                staged_holdings.values(), batch_size=bulk_batch_size, update_conflicts=True,
+                unique_fields=['external_ticket'], update_fields=holding_update_fields,
+            )
+
+            # --- Second Pass: Delete obsolete holdings from relevant DEFAULT portfolios ---
+            log.info("Holdings Pass 2: Deleting obsolete holdings from default portfolios...")
+            # Default portfolios that had holdings processed in this run
+            relevant_portfolio_ids = {portfolio_id for portfolio_id, _ in processed_holding_keys}
+            if relevant_portfolio_ids:
+                # Find holdings in these default portfolios whose (portfolio, external_ticket) pair is NOT in the set we just processed.
+                # Diffed in Python so the DELETE doesn't carry a NOT IN list that grows with the file.
+                # Only integer columns are fetched; the unique external_ticket identifies the row without loading its UUID pk.
+                obsolete_tickets = [
+                    ticket for portfolio_id, ticket in CustomerHolding.objects.filter(
+                        portfolio_id__in=relevant_portfolio_ids
+                    ).values_list('portfolio_id', 'external_ticket')
+                    if (portfolio_id, ticket) not in processed_holding_keys
+                ]
+                # Perform deletion in bulk, chunked to stay under SQLite's query variable limit.
+                # Nothing references CustomerHolding, so Django issues each batch as a single DELETE without collecting rows.
+                for start in range(0, len(obsolete_tickets), bulk_batch_size):
+                    batch_deleted_count, _ = CustomerHolding.objects.filter(
+                        external_ticket__in=obsolete_tickets[start:start + bulk_batch_size]
+                    ).delete()
+                    deleted_count += batch_deleted_count
+            else:
+                log.info("Holdings Deletion: No default portfolios had holdings processed, skipping deletion phase.")
+        if deleted_count > 0:
+            log.info(f"Holdings Deletion: Deleted {deleted_count} obsolete holdings from relevant default portfolios.")
+    except OperationalError: raise # Retried as a whole file by the task decorator
+    except Exception as e:
+        # The upsert and the deletions were rolled back together, so nothing was saved or deleted
+        log.error(f"Holdings Bulk Write: Error writing holdings, no changes saved: {e}", exc_info=True)
+        skipped_rows += created_count + updated_count; created_count = 0; updated_count = 0; deleted_count = 0
+
     result_message = (f"Processed holdings (Primary Portfolio Only) from {os.path.basename(file_path)}. "
                       f"Created: {created_count}, Updated: {updated_count}, Deleted: {deleted_count}, Skipped Rows: {skipped_rows}.")
     log.info(result_message)
@@ -1230,7 +1361,7 @@ def import_holdings_from_excel(self, file_path):
 
 
 # --- UPDATED Muni Offering Import Task ---
-@shared_task(bind=True, max_retries=1) # Keep max_retries=1 for muni? Or allow more?
+@shared_task(bind=True, autoretry_for=(OperationalError,), retry_backoff=5, max_retries=1) # Keep max_retries=1 for muni? Or allow more?
 def import_muni_offerings_from_excel(self, file_path):
     """
     Imports or updates municipal offerings from an Excel file based on CUSIP.
@@ -1238,22 +1369,19 @@ def import_muni_offerings_from_excel(self, file_path):
     """
     log.info(f"Starting municipal offering import/update from {file_path}")
     created_count = 0; updated_count = 0; skipped_rows = 0; deleted_count = 0
+    row_issues = Counter() # {reason: rows}, filled in by log_row_issue
 
     try:
-        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True); ws = wb.active
+        wb = openpyxl.load_workbook(filename=file_path, data_only=True, read_only=True, keep_links=False); ws = wb.active
     except FileNotFoundError: log.error(f"Municipal offering import file not found: {file_path}"); raise
     except Exception as e: log.error(f"Error opening municipal offering import file {file_path}: {e}", exc_info=True); raise
 
-    # --- Pre-import Deletion ---
-    try:
-        with transaction.atomic():
-            log.warning("Deleting ALL existing MunicipalOffering records before import...")
-            deleted_count, _ = MunicipalOffering.objects.all().delete(); log.info(f"Deleted {deleted_count} existing MunicipalOffering records.")
-    except Exception as e: log.error(f"Error during pre-import deletion of MunicipalOfferings: {e}", exc_info=True); wb.close(); raise
-
     # --- Header Mapping ---
-    headers = [str(cell.value).lower().strip().replace(' ', '_').replace('&', 'and') if cell.value else None for cell in ws[1]]
-    headers = [h for h in headers if h]; log.info(f"Found muni offering headers: {headers}")
+    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()) # Raw values, no Cell objects
+    headers = [str(value).lower().strip().replace(' ', '_').replace('&', 'and') if value else None for value in header_row]
+    # {header: column index}; blank header cells are skipped without shifting the columns after them
+    header_idx_map = {h: idx for idx, h in enumerate(headers) if h}
+    headers = list(header_idx_map); log.info(f"Found muni offering headers: {headers}")
     # Define mapping from expected Excel headers to model fields
     header_map = {
         'cusip': 'cusip', 'amount': 'amount', 'description': 'description', 'coupon': 'coupon',
@@ -1263,97 +1391,111 @@ def import_muni_offerings_from_excel(self, file_path):
     }
     # Check for mandatory CUSIP header
     if 'cusip' not in headers: log.error("Mandatory header 'cusip' not found."); wb.close(); raise ValueError("Mandatory header 'cusip' not found.")
+    cusip_idx = header_idx_map['cusip']
+    # (model field, column index) for each mapped header present in the file, resolved once instead of per row
+    field_columns = tuple((model_field, header_idx_map[excel_header]) for excel_header, model_field in header_map.items()
+                          if excel_header in header_idx_map and model_field != 'cusip') # CUSIP is validated separately
+    # Fields with few distinct values; interned so staged offerings share one string object per value
+    interned_fields = {'moody_rating', 'sp_rating', 'insurance'}
+    max_col = max(cusip_idx, *(col_idx for _, col_idx in field_columns)) + 1 # Cells right of the last mapped column are never read
+    decimal_fields = {'amount', 'coupon', 'yield_rate', 'price', 'call_price'}
+    date_fields = {'maturity_date', 'call_date'}
+    # Model fields by name, so rows that would fail the bulk write (and roll back the whole file) are skipped while staging
+    model_fields = {field.name: field for field in MunicipalOffering._meta.concrete_fields}
+
+    staged_offerings = {} # {cusip: unsaved MunicipalOffering}; a later row for a CUSIP replaces the earlier one
 
     # --- Row Processing ---
-    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_col=max_col, values_only=True), start=2):
         # Check for completely empty rows (common in Excel)
         if all(cell is None for cell in row):
-            log.debug(f"Muni Row {row_idx}: Skipping empty row.")
+            log.debug("Muni Row %s: Skipping empty row.", row_idx)
             continue
 
-        # Ensure row has enough columns to match headers found
-        if len(row) < len(headers):
-             log.warning(f"Muni Row {row_idx}: Row has fewer columns ({len(row)}) than headers ({len(headers)}). Skipping.")
-             skipped_rows += 1; continue
-
-        raw_data = dict(zip(headers, row))
-
         # --- CUSIP Cleaning and Validation ---
-        cusip_raw = raw_data.get('cusip')
-        if cusip_raw is None or str(cusip_raw).strip() == '':
-             log.warning(f"Muni Row {row_idx}: Skipping missing CUSIP."); skipped_rows += 1; continue
-        cusip = str(cusip_raw).strip().upper()
-        # Stricter CUSIP validation (9 chars, alphanumeric)
-        if len(cusip) != 9 or not cusip.isalnum():
-            log.warning(f"Muni Row {row_idx}: Invalid CUSIP format '{cusip_raw}'. Skipping row.")
+        # read_only rows are padded to the sheet width, so the index check only guards ragged files
+        cusip_raw = row[cusip_idx] if cusip_idx < len(row) else None
+        cusip = clean_string(cusip_raw).upper()
+        if not cusip:
+             log_row_issue(row_issues, 'missing_cusip', "Muni Row %s: Skipping missing CUSIP.", row_idx); skipped_rows += 1; continue
+        # Stricter CUSIP validation (9 chars, A-Z/0-9)
+        if not _CUSIP_MATCH(cusip):
+            log_row_issue(row_issues, 'invalid_cusip', "Muni Row %s: Invalid CUSIP format '%s'. Skipping row.", row_idx, cusip_raw)
             skipped_rows += 1; continue
 
         # --- Data Cleaning for other fields ---
         offering_defaults = {}; skip_this_row = False
-        for excel_header, model_field in header_map.items(): # Iterate through defined map
-             if excel_header in raw_data:
-                 raw_value = raw_data[excel_header]
+        row_len = len(row)
+        for model_field, col_idx in field_columns: # Mapped headers found in the file, in header_map order
+             if col_idx < row_len:
+                 raw_value = row[col_idx]
                  cleaned_value = None
 
-                 # *** Skip cleaning for CUSIP as it's already validated ***
-                 if model_field == 'cusip':
-                     continue # Already handled above
-
                  # Clean numeric fields
-                 elif model_field in ['amount', 'coupon', 'yield_rate', 'price', 'call_price']:
+                 if model_field in decimal_fields:
                      cleaned_value = clean_decimal(raw_value, decimal_places=6) # Adjust precision if needed
                      # Add non-negative validation if applicable
                      # cleaned_value = clean_decimal(raw_value, decimal_places=6, non_negative=True)
 
                  # Clean date fields
-                 elif model_field in ['maturity_date', 'call_date']:
-                     cleaned_value = clean_date(raw_value) # Use updated clean_date
+                 elif model_field in date_fields:
+                     cleaned_value = clean_date(raw_value, cache_key=f'muni.{model_field}') # Use updated clean_date
                      # Add validation: Skip if required date (e.g., maturity) is missing/invalid
                      if model_field == 'maturity_date' and cleaned_value is None and raw_value is not None:
-                          log.warning(f"Muni Row {row_idx} CUSIP {cusip}: Invalid or missing maturity date '{raw_value}'. Skipping row.")
+                          log_row_issue(row_issues, 'invalid_maturity_date', "Muni Row %s CUSIP %s: Invalid or missing maturity date '%s'. Skipping row.", row_idx, cusip, raw_value)
                           skip_this_row = True; break # Stop processing this row
                      elif cleaned_value is None and raw_value is not None:
                           # Log if cleaning failed for optional date but value was present
-                          log.warning(f"Muni Row {row_idx} CUSIP {cusip}: Failed to clean date for '{model_field}' from value '{raw_value}'. Storing as NULL.")
+                          log_row_issue(row_issues, 'invalid_optional_date', "Muni Row %s CUSIP %s: Failed to clean date for '%s' from value '%s'. Storing as NULL.", row_idx, cusip, model_field, raw_value)
 
                  # Clean state field
                  elif model_field == 'state':
-                     cleaned_value = str(raw_value).strip().upper() if raw_value is not None else None
+                     cleaned_value = sys.intern(str(raw_value).strip().upper()) if raw_value is not None else None
                      if cleaned_value and len(cleaned_value) != 2:
-                         log.warning(f"Muni Row {row_idx} CUSIP {cusip}: Invalid state format '{raw_value}'. Storing as NULL.")
+                         log_row_issue(row_issues, 'invalid_state', "Muni Row %s CUSIP %s: Invalid state format '%s'. Storing as NULL.", row_idx, cusip, raw_value)
                          cleaned_value = None # Store as NULL if invalid format
 
                  # Handle other string fields
                  else:
                      cleaned_value = str(raw_value).strip() if raw_value is not None else None
+                     if cleaned_value and model_field in interned_fields: cleaned_value = sys.intern(cleaned_value)
+
+                 # --- Check the cleaned value against the model field ---
+                 field = model_fields[model_field]
+                 if cleaned_value is None:
+                     if not field.null: cleaned_value = '' # Blank cells in non-null text fields (description) are stored as ''
+                 elif model_field in decimal_fields:
+                     try: format_number(cleaned_value, field.max_digits, field.decimal_places) # Same conversion the DB write applies
+                     except InvalidOperation:
+                         log_row_issue(row_issues, 'decimal_out_of_range', "Muni Row %s CUSIP %s: Value '%s' does not fit '%s'. Skipping row.", row_idx, cusip, raw_value, model_field)
+                         skip_this_row = True; break
+                 elif isinstance(cleaned_value, str) and field.max_length and len(cleaned_value) > field.max_length:
+                     log_row_issue(row_issues, 'value_too_long', "Muni Row %s CUSIP %s: Value for '%s' is longer than %s characters. Skipping row.", row_idx, cusip, model_field, field.max_length)
+                     skip_this_row = True; break
 
                  # Store cleaned value if valid, otherwise keep it None
                  # We store None even if cleaning failed but value was present (logged above)
                  offering_defaults[model_field] = cleaned_value
 
-             # else: # Log missing headers? Optional.
-             #     if excel_header in header_map:
-             #         log.warning(f"Muni Row {row_idx} CUSIP {cusip}: Missing expected header: {excel_header}")
-             #         offering_defaults[model_field] = None # Ensure field is None if header missing
+        if skip_this_row: skipped_rows += 1; continue # Skip row if a mandatory field failed cleaning or a value does not fit its field
 
-        if skip_this_row: skipped_rows += 1; continue # Skip row if mandatory field failed cleaning
+        # --- Stage offering for bulk insert ---
+        if cusip in staged_offerings: updated_count += 1; log.debug("Muni Row %s: Staged update to Offering: %s", row_idx, cusip)
+        else: created_count += 1; log.debug("Muni Row %s: Staged new Offering: %s", row_idx, cusip)
+        staged_offerings[cusip] = MunicipalOffering(cusip=cusip, **offering_defaults)
 
-        # --- Database operation ---
-        try:
-            with transaction.atomic():
-                offering, created = MunicipalOffering.objects.update_or_create(
-                    cusip=cusip, # Match on CUSIP
-                    defaults=offering_defaults # Update with cleaned values
-                )
-            log.debug(f"Muni Row {row_idx}: {'Created' if created else 'Updated'} Offering: {cusip}")
-            if created: created_count += 1
-            else: updated_count += 1
-        except IntegrityError as e: # Catch potential DB constraint violations
-            log.error(f"Muni Row {row_idx}: IntegrityError processing {cusip}: {e}", exc_info=True)
-            skipped_rows += 1
-        except Exception as e:
-            log.error(f"Muni Row {row_idx}: Error processing {cusip}: {e}", exc_info=True)
-            skipped_rows += 1
+    log_row_issue_summary("Muni Import", row_issues)
+
+    # --- Pre-import Deletion and Bulk Insert ---
+    # The table is emptied first, so every offering is a plain INSERT. Both run in one transaction (one commit per file);
+    # if the insert fails the deletion is rolled back too, so the table is never left empty.
+    log.info(f"Muni Bulk Write: Inserting {len(staged_offerings)} offerings ({created_count} new, {updated_count} duplicate CUSIP rows)...")
+    try:
+        with transaction.atomic():
+            log.warning("Deleting ALL existing MunicipalOffering records before import...")
+            deleted_count, _ = MunicipalOffering.objects.all().delete(); log.info(f"Deleted {deleted_count} existing MunicipalOffering records.")
+            MunicipalOffering.objects.bulk_create(staged_offerings.values(), batch_size=1000)
+    except Exception as e: log.error(f"Error during municipal offering import, all changes rolled back: {e}", exc_info=True); wb.close(); raise
 
     wb.close()
     result_message = (f"Imported/Updated municipal offerings from {os.path.basename(file_path)}. "
@@ -1367,8 +1509,12 @@ def import_muni_offerings_from_excel(self, file_path):
 @shared_task
 def import_all_from_excel():
     """
-    Orchestrates the import tasks in sequence using hardcoded paths.
+    Orchestrates the import tasks using hardcoded paths.
     Assumes standard filenames. Includes LOOKUP imports first.
+    Dependent imports run as a chain of stages; tasks within a stage only depend on earlier stages and are
+    grouped, so they may run concurrently if the import queue has more than one worker process.
+    Imports nothing depends on (munis) are scheduled on their own, outside the chain, so their failure
+    cannot stop the holdings refresh.
     Uses immutable signatures (.si) to prevent passing results.
     """
     log.info("Scheduling chained non-destructive import from hardcoded paths...")
@@ -1396,33 +1542,45 @@ def import_all_from_excel():
         'muni_offering': (import_muni_offerings_from_excel, filenames['muni_offering']),
     }
 
-    # Define the desired import order
-    import_order = [
-        'salesperson', 'security_type', 'interest_schedule', # Lookups First
-        'security',
-        'customer',
-        'holding',
-        'muni_offering' # Muni offerings last (or adjust if needed)
+    # Define the desired import order as dependency stages. Tasks in a stage only depend on earlier stages.
+    import_stages = [
+        ['salesperson', 'security_type', 'interest_schedule'], # Lookups First
+        ['security', 'customer'], # Securities need the lookups, customers need salespersons
+        ['holding'], # Holdings need securities and customers
     ]
+    # Imports with no dependencies in either direction; a failed chord header would skip holdings, so these stay out of the chain
+    independent_imports = ['muni_offering']
 
     task_list = []
+    stage_signatures = []
+    independent_signatures = []
     files_ok = True
     found_files_count = 0
 
     # Build the task list in the correct order, checking file existence
-    for import_key in import_order:
-        task_func, file_path = import_config[import_key]
-        if file_path.exists():
-            task_list.append(task_func.si(str(file_path)))
-            log.info(f"Chained Import: Found '{os.path.basename(file_path)}', adding task '{task_func.__name__}'.")
-            found_files_count += 1
-        else:
-            # Log error for mandatory files, warning for optional (like muni)
-            if import_key in ['salesperson', 'security_type', 'interest_schedule', 'security', 'customer', 'holding']:
-                log.error(f"Chained Import ERROR: Mandatory file not found: {file_path}")
-                files_ok = False # Mark overall status as problematic
+    for stage in import_stages + [independent_imports]:
+        is_independent = stage is independent_imports
+        stage_tasks = []
+        for import_key in stage:
+            task_func, file_path = import_config[import_key]
+            if file_path.exists():
+                stage_tasks.append(task_func.si(str(file_path)))
+                log.info(f"Chained Import: Found '{os.path.basename(file_path)}', adding task '{task_func.__name__}'.")
+                found_files_count += 1
             else:
-                log.warning(f"Chained Import: Optional file not found: {file_path}. Skipping {task_func.__name__}.")
+                # Log error for mandatory files, warning for optional (like muni)
+                if import_key in ['salesperson', 'security_type', 'interest_schedule', 'security', 'customer', 'holding']:
+                    log.error(f"Chained Import ERROR: Mandatory file not found: {file_path}")
+                    files_ok = False # Mark overall status as problematic
+                else:
+                    log.warning(f"Chained Import: Optional file not found: {file_path}. Skipping {task_func.__name__}.")
+        task_list.extend(stage_tasks)
+        if is_independent:
+            independent_signatures.extend(stage_tasks)
+        elif len(stage_tasks) > 1:
+            stage_signatures.append(group(stage_tasks)) # A group followed by another stage runs as a chord
+        elif stage_tasks:
+            stage_signatures.append(stage_tasks[0])
 
     if not task_list:
         result_message = "Chained Import Error: No import tasks could be added (no files found or critical files missing)."
@@ -1432,9 +1590,12 @@ def import_all_from_excel():
          log.error("Chained Import Error: One or more mandatory import files were missing. Chain may be incomplete.")
          # Proceed with the chain anyway, but log the error clearly
 
-    # Create and run the chain
-    import_chain = chain(task_list)
-    import_chain.apply_async()
+    # Create and run the chain of stages, then the independent imports
+    if stage_signatures:
+        import_chain = chain(stage_signatures)
+        import_chain.apply_async()
+    for signature in independent_signatures:
+        signature.apply_async()
 
     result_message = f"Scheduled chained import tasks ({len(task_list)} tasks from {found_files_count} files). Mandatory File Status OK: {files_ok}."
     log.info(result_message)
@@ -3,8 +3,10 @@ import os
 from unittest.mock import patch, MagicMock
 from django.test import TestCase
 from django.conf import settings
+from django.db import IntegrityError, OperationalError
 from django.core.files.uploadedfile import SimpleUploadedFile # Not used directly, but good for future tests with actual files
 from decimal import Decimal, InvalidOperation
+from collections import Counter
 from datetime import date, datetime
 from pathlib import Path # Still needed for type hints or direct Path usage in tests if any
 
@@ -13,8 +15,16 @@ from pathlib import Path # Still needed for type hints or direct Path usage in t
 from portfolio.tasks import (
     # Data cleaning helpers
     clean_decimal,
+    clean_integer,
     clean_date,
+    _date_format_cache,
+    _cached_validate_email,
+    _CUSIP_MATCH,
     clean_boolean_from_char,
+    clean_string,
+    build_row_extractor,
+    log_row_issue,
+    log_row_issue_summary,
     # Import tasks
     import_salespersons_from_excel,
     import_security_types_from_excel,
@@ -48,6 +58,9 @@ class DataCleaningHelpersTest(TestCase):
         self.assertEqual(clean_decimal("5%"), Decimal("5")) # With percentage sign
         self.assertEqual(clean_decimal("(100.00)"), Decimal("-100.00")) # Accounting negative
         self.assertEqual(clean_decimal("  78.9  "), Decimal("78.9")) # With whitespace
+        self.assertEqual(clean_decimal(250), Decimal("250")) # Numeric cell values
+        self.assertEqual(clean_decimal(0.1), Decimal("0.1")) # Float keeps its shortest repr, not binary noise
+        self.assertIsNone(clean_decimal(float('nan')))
 
         # Test invalid inputs returning None or default
         self.assertIsNone(clean_decimal("invalid_string"))
@@ -65,6 +78,47 @@ class DataCleaningHelpersTest(TestCase):
         # Test decimal_places (note: current clean_decimal logs a warning but doesn't quantize)
         self.assertEqual(clean_decimal("123.4567", decimal_places=2), Decimal("123.4567"))
 
+    def test_clean_integer(self):
+        self.assertEqual(clean_integer(42), 42)
+        self.assertEqual(clean_integer(" 7 "), 7)
+        self.assertEqual(clean_integer(12.0), 12)
+        self.assertEqual(clean_integer("1,234"), 1234)
+        self.assertEqual(clean_integer("12.7"), 12) # Truncated like int(Decimal)
+        self.assertIsNone(clean_integer(None))
+        self.assertIsNone(clean_integer(True))
+        self.assertIsNone(clean_integer("abc"))
+        self.assertIsNone(clean_integer(float('inf')))
+        self.assertEqual(clean_integer("", default=0), 0)
+        self.assertIsNone(clean_integer(-5, non_negative=True))
+        with self.assertNoLogs('portfolio.tasks', level='WARNING'):
+            self.assertIsNone(clean_integer("abc", quiet=True))
+            self.assertIsNone(clean_integer(-5, non_negative=True, quiet=True))
+
+    def test_cached_validate_email(self):
+        self.assertTrue(_cached_validate_email("john.doe@example.com"))
+        self.assertTrue(_cached_validate_email("john.doe@example.com")) # Served from the memo
+        self.assertFalse(_cached_validate_email("john.doe@"))
+        self.assertFalse(_cached_validate_email("john.doe@"))
+
+    def test_cusip_match(self):
+        self.assertTrue(_CUSIP_MATCH("SECURI001"))
+        self.assertFalse(_CUSIP_MATCH("SECURI01")) # Too short
+        self.assertFalse(_CUSIP_MATCH("SECURI0011")) # Too long
+        self.assertFalse(_CUSIP_MATCH("SECURI-01")) # Not alphanumeric
+        self.assertFalse(_CUSIP_MATCH("SÉCURI001")) # Non-ASCII letters are rejected
+
+    def test_log_row_issue_limits_warnings_per_reason(self):
+        row_issues = Counter()
+        with self.assertLogs('portfolio.tasks', level='WARNING') as log_capture:
+            for row_idx in range(2, 32): # 30 rows with the same problem
+                log_row_issue(row_issues, 'invalid_tax_code', "Sec Row %s: Invalid tax_cd. Skipping row.", row_idx)
+            log_row_issue(row_issues, 'missing_cusip', "Sec Row %s: Skip missing CUSIP.", 40)
+            log_row_issue_summary("Security Import", row_issues)
+        self.assertEqual(row_issues, Counter({'invalid_tax_code': 30, 'missing_cusip': 1}))
+        self.assertEqual(sum("Invalid tax_cd" in line for line in log_capture.output), 20)
+        self.assertTrue(any("Sec Row 40: Skip missing CUSIP." in line for line in log_capture.output))
+        self.assertTrue(any("10 further row warnings were not logged" in line for line in log_capture.output))
+
     def test_clean_date(self):
         # Test successful conversions with various formats
         self.assertEqual(clean_date("12/31/2023"), date(2023, 12, 31))
@@ -79,6 +133,9 @@ class DataCleaningHelpersTest(TestCase):
         self.assertEqual(clean_date("invalid", default=date(2000,1,1)), date(2000,1,1))
         self.assertIsNone(clean_date("01/  /2023"))
         self.assertIsNone(clean_date("31/13/2023"))
+        # Repeated strings parse the same way when served from the memo
+        self.assertEqual(clean_date("12/31/2023"), date(2023, 12, 31))
+        self.assertIsNone(clean_date("31/13/2023"))
 
         self.assertIsNone(clean_date(None))
         self.assertEqual(clean_date(None, default=date(1999,1,1)), date(1999,1,1))
@@ -97,6 +154,15 @@ class DataCleaningHelpersTest(TestCase):
             self.assertIsNone(clean_date(3000000)) # Test heuristic for large numbers
             mock_from_excel_large_num.assert_not_called()
 
+    def test_clean_date_format_cache(self):
+        # The last working format for a column is remembered and tried first; other formats still parse
+        self.assertEqual(clean_date("2023-12-31", cache_key='test.iso_column'), date(2023, 12, 31))
+        self.assertEqual(_date_format_cache['test.iso_column'], '%Y-%m-%d')
+        self.assertEqual(clean_date("2024-01-15", cache_key='test.iso_column'), date(2024, 1, 15))
+        self.assertEqual(clean_date("01/15/2024", cache_key='test.iso_column'), date(2024, 1, 15))
+        self.assertEqual(_date_format_cache['test.iso_column'], '%m/%d/%Y')
+        self.assertIsNone(clean_date("not a date", cache_key='test.iso_column'))
+
     def test_clean_boolean_from_char(self):
         for val in ['y', 'Y', 'yes', 'YES', 'True', 'TRUE', '1', 't', 'T']:
             self.assertTrue(clean_boolean_from_char(val), f"Failed for true value: {val}")
@@ -104,6 +170,22 @@ class DataCleaningHelpersTest(TestCase):
             self.assertFalse(clean_boolean_from_char(val), f"Failed for false value: {val}")
         self.assertIsNone(clean_boolean_from_char(None))
 
+    def test_clean_string(self):
+        self.assertEqual(clean_string("  Alpha  "), "Alpha")
+        self.assertEqual(clean_string(123), "123")
+        self.assertEqual(clean_string(None), "")
+        self.assertIsNone(clean_string(None, default=None))
+
+    def test_build_row_extractor(self):
+        col_idx_map = {'cusip': 0, 'name': 2}
+        extract = build_row_extractor(col_idx_map, ('name', 'cusip', 'missing_field'))
+        self.assertEqual(extract(('CUSIP0001', 'ignored', 'Name')), ('Name', 'CUSIP0001', None))
+        self.assertEqual(extract(('CUSIP0001',)), (None, 'CUSIP0001', None)) # Short row is padded
+        self.assertEqual(extract(('CUSIP0001', 'ignored', 'Name', 'Unmapped')), ('Name', 'CUSIP0001', None)) # Extra columns are not read as missing fields
+        extract_mapped = build_row_extractor(col_idx_map, ('cusip', 'name'))
+        self.assertEqual(extract_mapped(('CUSIP0001', 'ignored', 'Name', 'Unmapped')), ('CUSIP0001', 'Name'))
+        self.assertEqual(extract_mapped(('CUSIP0001',)), ('CUSIP0001', None))
+
 
 class ImportTasksTest(TestCase):
     @classmethod
@@ -140,9 +222,11 @@ class ImportTasksTest(TestCase):
     def _setup_mock_workbook_data(self, header_row, data_rows_values_only):
         """ Helper to set up mock worksheet and workbook, returns the mock_workbook. """
         mock_ws = MagicMock()
-        mock_header_cells = [MagicMock(value=val) for val in header_row]
-        mock_ws.__getitem__.return_value = mock_header_cells
-        mock_ws.iter_rows.return_value = data_rows_values_only
+        def mock_iter_rows(min_row=None, max_row=None, **kwargs):
+            # Header reads ask for row 1 only; every other call gets the data rows
+            if min_row == 1 and max_row == 1: return iter([tuple(header_row)])
+            return iter(data_rows_values_only)
+        mock_ws.iter_rows.side_effect = mock_iter_rows
         mock_workbook = MagicMock()
         mock_workbook.active = mock_ws
         return mock_workbook
@@ -185,6 +269,11 @@ class ImportTasksTest(TestCase):
             self.assertTrue(any("Skip missing slsm_id" in msg for msg in log_capture.output))
         self.assertEqual(Salesperson.objects.count(), initial_count)
 
+        data_quoted_email = [('SP_QUOTED', 'Quoted Email Person', '"a@b"@example.com')] # Accepted by validate_email
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers_good, data_quoted_email)
+        import_salespersons_from_excel(DUMMY_EXCEL_PATH)
+        self.assertEqual(Salesperson.objects.get(salesperson_id="SP_QUOTED").email, '"a@b"@example.com')
+
         data_bad_email = [('SP_BADEMAIL', 'Bad Email Person', 'notanemail@')]
         mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers_good, data_bad_email)
         with self.assertLogs('portfolio.tasks', level='WARNING') as log_capture:
@@ -241,12 +330,34 @@ class ImportTasksTest(TestCase):
         self.assertEqual(updated_is.description, "Pays twice a year", "Existing description changed unexpectedly; if intentional, update test. Else, check tasks.py header_map.")
 
 
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_lookups_from_excel_failed_write_reports_no_changes(self, mock_openpyxl_load_workbook):
+        cases = [
+            (import_salespersons_from_excel, Salesperson, ['slsm_id', 'name', 'email'],
+             [('SPNEW01', 'Alice Wonderland', 'alice@example.com'), ('S001', 'Test Salesperson One UPD', None)], "Salespersons"),
+            (import_security_types_from_excel, SecurityType, ['sec_type', 'meaning'],
+             [(10, 'Corporate Bond New'), (2, 'Common Stock UPDATED')], "SecurityTypes"),
+            (import_interest_schedules_from_excel, InterestSchedule, ['int_sched', 'meaning'],
+             [('MONTHLY', 'Monthly Payment'), ('SEMI', 'Semiannual UPDATED')], "InterestSchedules"),
+        ]
+        for import_task, model, headers, data, label in cases:
+            with self.subTest(label=label):
+                mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+                with patch.object(model.objects, 'bulk_create', side_effect=IntegrityError("write failed")), \
+                     self.assertLogs('portfolio.tasks', level='INFO') as log_capture:
+                    import_task(DUMMY_EXCEL_PATH)
+                self.assertTrue(any(f"Imported/Updated {label} from" in msg and "Created: 0, Updated: 0, Skipped: 2." in msg
+                                    for msg in log_capture.output), log_capture.output)
+
     @patch('portfolio.tasks.openpyxl.load_workbook')
     def test_import_securities_from_excel_success(self, mock_openpyxl_load_workbook):
         headers = ['sec_id', 'sec_desc_1', 'issue_dt', 'mat_dt', 'sec_type', 'rate', 'tax_cd', 'int_sched', 'int_day', 'int_calc_cd', 'ppy', 'prin_paydown', 'pmt_delay', 'factor', 'cpr', 'issuer_name', 'secrate_rate', 'rate_dt', 'callable_flag_excel', 'call_date']
         data = [
             ('NEWSEC001', 'New Security One', '01/01/2024', '01/01/2034', self.sec_type_bond.type_id, 3.0, 't', self.int_sched_semi.schedule_code, 1, 'a', 2, 'n', 0, 1.0, 5.0, 'New Issuer Inc.', None, None, 'N', None),
-            ('SECURI001', 'Test Security One UPD', '02/01/2020', '02/01/2030', self.sec_type_bond.type_id, 2.75, 'e', self.int_sched_annual.schedule_code, 20, 'c', 1, 'y', 2, 0.95, 6.5, 'Test Issuer One UPD', 2.80, '01/15/2023', 'Y', '07/01/2025')
+            ('SECURI001', 'Test Security One UPD', '02/01/2020', '02/01/2030', self.sec_type_bond.type_id, 2.75, 'e', self.int_sched_annual.schedule_code, 20, 'c', 1, 'y', 2, 0.95, 6.5, 'Test Issuer One UPD', 2.80, '01/15/2023', 'Y', '07/01/2025'),
+            ('NEWSEC001', 'New Security One', '01/01/2024', '01/01/2034', self.sec_type_bond.type_id, 3.0, 't', self.int_sched_semi.schedule_code, 1, 'a', 2, 'n', 0, 1.0, 5.5, 'New Issuer Inc.', None, None, 'N', None), # Repeated CUSIP, later row wins
+            (None,), # Blank key cell, skipped before the other columns are read
+            ('BADCUSIP', 'Short CUSIP'),
         ]
         mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
         initial_sec_count = Security.objects.count()
@@ -254,12 +365,30 @@ class ImportTasksTest(TestCase):
         self.assertEqual(Security.objects.count(), initial_sec_count + 1)
         new_sec = Security.objects.get(cusip="NEWSEC001")
         self.assertEqual(new_sec.description, "New Security One")
+        self.assertEqual(new_sec.cpr, Decimal("5.5"))
         updated_sec = Security.objects.get(cusip="SECURI001")
         self.assertEqual(updated_sec.coupon, Decimal("2.80")) 
         self.assertEqual(updated_sec.rate_effective_date, date(2023, 1, 15))
         self.assertTrue(updated_sec.callable_flag)
         self.assertEqual(updated_sec.call_date, date(2025, 7, 1))
+        self.assertEqual(updated_sec.security_type, self.sec_type_bond)
+        self.assertEqual(updated_sec.interest_schedule, self.int_sched_annual)
+
 
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_customers_from_excel_lock_error_propagates(self, mock_openpyxl_load_workbook):
+        headers = ['cust_num', 'cust_na1', 'city', 'state', 'slsm_id', 'ip_bnk']
+        data = [(9001, 'New Customer Ltd.', 'NewCity', 'NY', self.salesperson2.salesperson_id, 'NEWCUSTACC')]
+        mock_workbook = self._setup_mock_workbook_data(headers, data)
+        mock_openpyxl_load_workbook.return_value = mock_workbook
+        with patch.object(Customer.objects, 'bulk_create', side_effect=OperationalError("database is locked")):
+            with self.assertRaises(OperationalError): # Not swallowed into "Skipped Rows"
+                import_customers_from_excel(DUMMY_EXCEL_PATH)
+        mock_workbook.close.assert_called_once() # Closed before the write
+        # Lock errors are retried as a whole file, like the other imports
+        self.assertIn(OperationalError, import_customers_from_excel.autoretry_for)
+        self.assertEqual(import_customers_from_excel.max_retries, 3)
+        self.assertFalse(Customer.objects.filter(customer_number=9001).exists())
 
     @patch('portfolio.tasks.openpyxl.load_workbook')
     def test_import_customers_from_excel_success(self, mock_openpyxl_load_workbook):
@@ -274,9 +403,12 @@ class ImportTasksTest(TestCase):
         self.assertEqual(Customer.objects.count(), initial_cust_count + 1)
         new_cust = Customer.objects.get(customer_number=9001)
         self.assertEqual(new_cust.name, "New Customer Ltd.")
+        self.assertEqual(new_cust.salesperson, self.salesperson2)
         self.assertTrue(Portfolio.objects.filter(owner=new_cust, is_default=True, name="New Customer Ltd. - Primary Holdings").exists())
         updated_cust = Customer.objects.get(customer_number=self.customer1.customer_number)
         self.assertEqual(updated_cust.name, "Existing Customer One UPDATED")
+        self.assertEqual(updated_cust.pk, self.customer1.pk) # Upserted in place, not re-inserted
+        self.assertEqual(updated_cust.unique_id, self.customer1.unique_id)
         self.assertTrue(Portfolio.objects.filter(owner=updated_cust, is_default=True, name="Existing Customer One UPDATED - Primary Holdings").exists())
 
     @patch('portfolio.tasks.openpyxl.load_workbook')
@@ -296,26 +428,112 @@ class ImportTasksTest(TestCase):
         self.assertEqual(CustomerHolding.objects.count(), 3)
         self.assertTrue(CustomerHolding.objects.filter(external_ticket=20001).exists())
         self.assertTrue(CustomerHolding.objects.filter(external_ticket=10001).exists())
+        updated_holding = CustomerHolding.objects.get(external_ticket=10001)
+        self.assertEqual(updated_holding.intention_code, 'M')
+        self.assertEqual(updated_holding.original_face_amount, Decimal("60000"))
+        self.assertEqual(updated_holding.book_yield, Decimal("4.8"))
         self.assertTrue(CustomerHolding.objects.filter(external_ticket=20002).exists())
         self.assertFalse(CustomerHolding.objects.filter(external_ticket=99999).exists())
         self.assertFalse(CustomerHolding.objects.filter(external_ticket=77777).exists())
 
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_holdings_from_excel_failed_deletion_rolls_back_upsert(self, mock_openpyxl_load_workbook):
+        CustomerHolding.objects.create(external_ticket=99999, portfolio=self.portfolio1, security=self.security2, original_face_amount=Decimal("20000"), settlement_date=date(2022,2,1), settlement_price=Decimal("101"), book_price=Decimal("100"), intention_code='M')
+        headers = ['ticket', 'cust_num', 'sec_id', 'lc_xf1_cd', 'orig_face', 'settle_dt', 'set_price', 'book_price']
+        data = [(20001, self.customer1.customer_number, self.security2.cusip, 'T', 75000, '03/15/2023', 100.5, 100.2)]
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+        with patch('django.db.models.query.QuerySet.delete', side_effect=RuntimeError("delete failed")):
+            import_holdings_from_excel(DUMMY_EXCEL_PATH)
+        # Upsert and deletion share one transaction, so neither took effect
+        self.assertFalse(CustomerHolding.objects.filter(external_ticket=20001).exists())
+        self.assertTrue(CustomerHolding.objects.filter(external_ticket=99999).exists())
+
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_holdings_from_excel_upsert_keeps_existing_row(self, mock_openpyxl_load_workbook):
+        existing = CustomerHolding.objects.create(external_ticket=10001, portfolio=self.portfolio1, security=self.security1, original_face_amount=Decimal("50000"), settlement_date=date(2022,1,1), settlement_price=Decimal("100"), book_price=Decimal("99"), intention_code='A')
+        headers = ['ticket', 'cust_num', 'sec_id', 'lc_xf1_cd', 'orig_face', 'settle_dt', 'set_price', 'book_price']
+        data = [
+            (10001, self.customer1.customer_number, self.security2.cusip, 'T', 70000, '03/15/2023', 100.5, 100.2),
+            (10001, self.customer1.customer_number, self.security2.cusip, 'T', 75000, '03/15/2023', 100.5, 100.2), # Repeated ticket, later row wins
+        ]
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+        import_holdings_from_excel(DUMMY_EXCEL_PATH)
+        self.assertEqual(CustomerHolding.objects.count(), 1)
+        holding = CustomerHolding.objects.get(external_ticket=10001)
+        self.assertEqual(holding.ticket_id, existing.ticket_id) # Updated in place, not re-inserted
+        self.assertEqual(holding.created_at, existing.created_at)
+        self.assertEqual(holding.security, self.security2)
+        self.assertEqual(holding.original_face_amount, Decimal("75000"))
+
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_holdings_from_excel_limits_repeated_row_warnings(self, mock_openpyxl_load_workbook):
+        headers = ['ticket', 'cust_num', 'sec_id', 'lc_xf1_cd', 'orig_face', 'settle_dt', 'set_price', 'book_price']
+        data = [(40000 + i, self.customer1.customer_number, 'UNKNOWN01', 'A', 1000, '01/01/2023', 100, 100) for i in range(30)]
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+        with self.assertLogs('portfolio.tasks', level='INFO') as log_capture:
+            import_holdings_from_excel(DUMMY_EXCEL_PATH)
+        self.assertEqual(sum("Skip unknown cusip UNKNOWN01" in msg for msg in log_capture.output), 20)
+        self.assertTrue(any("Holding Import: Row issues by reason: {'unknown_cusip': 30}" in msg for msg in log_capture.output))
+        self.assertTrue(any("Skipped Rows: 30." in msg for msg in log_capture.output))
+
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_holdings_from_excel_skips_unknown_customer_and_security(self, mock_openpyxl_load_workbook):
+        headers = ['ticket', 'cust_num', 'sec_id', 'lc_xf1_cd', 'orig_face', 'settle_dt', 'set_price', 'book_price']
+        data = [
+            (30001, 9999, self.security1.cusip, 'A', 1000, '01/01/2023', 100, 100), # Unknown customer
+            (30002, self.customer1.customer_number, 'UNKNOWN01', 'A', 1000, '01/01/2023', 100, 100), # Unknown security
+            (30003, self.customer1.customer_number, self.security1.cusip.lower(), 'A', 1000, '01/01/2023', 100, 100),
+        ]
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+        with self.assertLogs('portfolio.tasks', level='WARNING') as log_capture:
+            import_holdings_from_excel(DUMMY_EXCEL_PATH)
+        self.assertTrue(any("Skip unknown customer_number 9999" in msg for msg in log_capture.output))
+        self.assertTrue(any("Skip unknown cusip UNKNOWN01" in msg for msg in log_capture.output))
+        self.assertEqual(list(CustomerHolding.objects.values_list('external_ticket', flat=True)), [30003])
+        self.assertEqual(CustomerHolding.objects.get(external_ticket=30003).portfolio, self.portfolio1)
+
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_holdings_from_excel_prescan_uses_pass1_parser(self, mock_openpyxl_load_workbook):
+        headers = ['ticket', 'cust_num', 'sec_id', 'lc_xf1_cd', 'orig_face', 'settle_dt', 'set_price', 'book_price']
+        data = [('30004%', f"{self.customer1.customer_number}%", self.security1.cusip, 'A', 1000, '01/01/2023', 100, 100)]
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+        import_holdings_from_excel(DUMMY_EXCEL_PATH)
+        self.assertEqual(CustomerHolding.objects.get(external_ticket=30004).portfolio, self.portfolio1)
+
     @patch('portfolio.tasks.openpyxl.load_workbook')
     def test_import_muni_offerings_from_excel_success_and_deletion(self, mock_openpyxl_load_workbook):
         headers = ['cusip', 'description', 'amount', 'price', 'maturity', 'yield', 'state', 'call_date', 'call_price']
         data = [
             ('MUNIIMP01', 'Imported Muni One', 5000000, 102.5, '12/31/2030', 3.5, 'CA', '06/30/2028', 101.0),
-            ('MUNIIMP02', 'Imported Muni Two', 2000000, 101.0, '06/30/2028', 3.2, 'NY', None, None)
+            ('MUNIIMP02', 'Imported Muni Two', 2000000, 101.0, '06/30/2028', 3.2, 'NY', None, None),
+            ('MUNIIMP02', 'Imported Muni Two Revised', 1500000, 100.5, '06/30/2028', 3.1, 'NY', None, None), # Later row wins
         ]
         mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
         MunicipalOffering.objects.create(cusip="OLDMUNI01", description="Old Offering 1", amount=1000, price=100)
         self.assertEqual(MunicipalOffering.objects.count(), 1) 
-        import_muni_offerings_from_excel(DUMMY_EXCEL_PATH)
+        result_message = import_muni_offerings_from_excel(DUMMY_EXCEL_PATH)
         self.assertEqual(MunicipalOffering.objects.count(), 2) 
         self.assertTrue(MunicipalOffering.objects.filter(cusip="MUNIIMP01").exists())
+        self.assertEqual(MunicipalOffering.objects.get(cusip="MUNIIMP02").description, 'Imported Muni Two Revised')
+        self.assertIn("Deleted: 1, Created: 2, Updated: 1, Skipped: 0.", result_message)
         self.assertFalse(MunicipalOffering.objects.filter(cusip="OLDMUNI01").exists())
 
 
+    @patch('portfolio.tasks.openpyxl.load_workbook')
+    def test_import_muni_offerings_from_excel_blank_description_and_bad_value(self, mock_openpyxl_load_workbook):
+        headers = ['cusip', 'description', 'amount', 'price', 'maturity']
+        data = [
+            ('MUNIIMP01', 'Imported Muni One', 5000000, 102.5, '12/31/2030'),
+            ('MUNIIMP02', None, 2000000, 101.0, '06/30/2028'), # Blank description is stored as ''
+            ('MUNIIMP03', 'Too Large', 10 ** 15, 100.0, '06/30/2028'), # Exceeds amount max_digits
+        ]
+        mock_openpyxl_load_workbook.return_value = self._setup_mock_workbook_data(headers, data)
+        MunicipalOffering.objects.create(cusip="OLDMUNI01", description="Old Offering 1", amount=1000, price=100)
+        result_message = import_muni_offerings_from_excel(DUMMY_EXCEL_PATH)
+        self.assertIn("Deleted: 1, Created: 2, Updated: 0, Skipped: 1.", result_message)
+        self.assertEqual(MunicipalOffering.objects.get(cusip="MUNIIMP02").description, '')
+        self.assertEqual(sorted(MunicipalOffering.objects.values_list('cusip', flat=True)), ['MUNIIMP01', 'MUNIIMP02'])
+
 class OrchestrationTasksTest(TestCase):
     # When patching, patch where the object is looked up.
     # In tasks.py, Path objects are created (e.g., settings.BASE_DIR / 'data' / 'imports'),
@@ -330,9 +548,10 @@ class OrchestrationTasksTest(TestCase):
     @patch('portfolio.tasks.import_customers_from_excel.si')
     @patch('portfolio.tasks.import_holdings_from_excel.si')
     @patch('portfolio.tasks.import_muni_offerings_from_excel.si')
+    @patch('portfolio.tasks.group')
     @patch('portfolio.tasks.chain') 
     @patch('pathlib.Path.exists', autospec=True) # REVERTED to pathlib.Path.exists and added autospec
-    def test_import_all_from_excel_all_files_exist(self, mock_path_exists_method, mock_celery_chain,
+    def test_import_all_from_excel_all_files_exist(self, mock_path_exists_method, mock_celery_chain, mock_celery_group,
                                                    mock_muni_task_si, mock_hold_task_si, mock_cust_task_si,
                                                    mock_sec_task_si, mock_int_sch_task_si, mock_sec_type_task_si,
                                                    mock_sales_task_si): 
@@ -344,14 +563,25 @@ class OrchestrationTasksTest(TestCase):
         result_message = import_all_from_excel()
         self.assertEqual(mock_celery_chain.call_count, 1)
         actual_chain_args = mock_celery_chain.call_args[0][0]
-        self.assertEqual(len(actual_chain_args), 7, "Should schedule 7 tasks when all files exist.")
+        self.assertEqual(len(actual_chain_args), 3, "Should schedule 3 stages when all files exist.")
+        # Lookups run as one group, then securities/customers, then holdings alone
+        self.assertEqual(mock_celery_group.call_count, 2)
+        self.assertEqual(mock_celery_group.call_args_list[0][0][0], [task_signature_mocks[mock_sales_task_si], task_signature_mocks[mock_sec_type_task_si], task_signature_mocks[mock_int_sch_task_si]])
+        self.assertEqual(mock_celery_group.call_args_list[1][0][0], [task_signature_mocks[mock_sec_task_si], task_signature_mocks[mock_cust_task_si]])
+        self.assertIs(actual_chain_args[2], task_signature_mocks[mock_hold_task_si])
         mock_chain_instance.apply_async.assert_called_once()
+        # Munis are scheduled on their own, so a failed muni import can't stop holdings
+        task_signature_mocks[mock_muni_task_si].apply_async.assert_called_once()
+        self.assertNotIn(task_signature_mocks[mock_muni_task_si], actual_chain_args)
+        for group_call in mock_celery_group.call_args_list:
+            self.assertNotIn(task_signature_mocks[mock_muni_task_si], group_call[0][0])
         base_path = settings.BASE_DIR / 'data' / 'imports'
         mock_sales_task_si.assert_called_once_with(str(base_path / 'Salesperson.xlsx'))
         mock_muni_task_si.assert_called_once_with(str(base_path / 'muni_offerings.xlsx'))
         self.assertIn("Scheduled chained import tasks (7 tasks from 7 files). Mandatory File Status OK: True", result_message)
 
     @patch('pathlib.Path.exists', autospec=True) # REVERTED to pathlib.Path.exists and added autospec
+    @patch('portfolio.tasks.group')
     @patch('portfolio.tasks.chain')
     @patch('portfolio.tasks.import_muni_offerings_from_excel.si') 
     @patch('portfolio.tasks.import_holdings_from_excel.si')
@@ -360,7 +590,7 @@ class OrchestrationTasksTest(TestCase):
     @patch('portfolio.tasks.import_salespersons_from_excel.si')
     def test_import_all_from_excel_missing_mandatory_file(self, mock_sales_si, mock_sec_type_si,
                                                            mock_int_sched_si, mock_hold_si, mock_muni_si,
-                                                           mock_celery_chain, mock_path_exists_method): 
+                                                           mock_celery_chain, mock_celery_group, mock_path_exists_method): 
         # The side_effect function for Path.exists should accept the Path instance (self)
         # as its first argument because .exists() is an instance method.
         def side_effect_for_path_exists(path_instance_self_arg):
@@ -376,8 +606,11 @@ class OrchestrationTasksTest(TestCase):
         result_message = import_all_from_excel() 
         
         mock_celery_chain.assert_called_once()
-        self.assertEqual(len(mock_celery_chain.call_args[0][0]), 5, "Should schedule 5 tasks if Security and Customer files are missing.")
+        self.assertEqual(len(mock_celery_chain.call_args[0][0]), 2, "Lookups and holdings remain if Security and Customer files are missing.")
+        self.assertEqual(mock_celery_group.call_count, 1, "Only the lookup stage has more than one task left.")
+        self.assertIs(mock_celery_chain.call_args[0][0][1], mock_hold_si.return_value)
         mock_chain_instance.apply_async.assert_called_once()
+        mock_muni_si.return_value.apply_async.assert_called_once()
         self.assertIn("Mandatory File Status OK: False", result_message)
         self.assertIn("Scheduled chained import tasks (5 tasks from 5 files).", result_message) 
         mock_sales_si.assert_called_once()
@@ -387,6 +620,7 @@ class OrchestrationTasksTest(TestCase):
         mock_muni_si.assert_called_once() 
 
     @patch('pathlib.Path.exists', autospec=True) # REVERTED to pathlib.Path.exists and added autospec
+    @patch('portfolio.tasks.group')
     @patch('portfolio.tasks.chain')
     @patch('portfolio.tasks.import_holdings_from_excel.si')
     @patch('portfolio.tasks.import_customers_from_excel.si')
@@ -396,7 +630,7 @@ class OrchestrationTasksTest(TestCase):
     @patch('portfolio.tasks.import_salespersons_from_excel.si')
     def test_import_all_from_excel_missing_optional_file(self, mock_sales_si, mock_sec_type_si, mock_int_sched_si,
                                                           mock_sec_si, mock_cust_si, mock_hold_si,
-                                                          mock_celery_chain, mock_path_exists_method): 
+                                                          mock_celery_chain, mock_celery_group, mock_path_exists_method): 
         def side_effect_for_path_exists(path_instance_self_arg):
             if 'muni_offerings.xlsx' in str(path_instance_self_arg).lower():
                 return False # Simulate optional muni file as missing
@@ -409,7 +643,8 @@ class OrchestrationTasksTest(TestCase):
         result_message = import_all_from_excel() 
 
         mock_celery_chain.assert_called_once()
-        self.assertEqual(len(mock_celery_chain.call_args[0][0]), 6, "Should schedule 6 tasks if optional muni file is missing.")
+        self.assertEqual(len(mock_celery_chain.call_args[0][0]), 3, "Should schedule 3 stages if optional muni file is missing.")
+        self.assertEqual(mock_celery_group.call_args_list[1][0][0], [mock_sec_si.return_value, mock_cust_si.return_value])
         mock_chain_instance.apply_async.assert_called_once()
         self.assertIn("Mandatory File Status OK: True", result_message) 
         self.assertIn("Scheduled chained import tasks (6 tasks from 6 files).", result_message)
@@ -161,6 +161,7 @@ def generate_quantlib_cashflows(holding: CustomerHolding, evaluation_date: date)
         schedule_dates = list(schedule) 
         tolerance = 1e-6 
         first_interest_period_logged = False 
+        debug_enabled = log.isEnabledFor(logging.DEBUG) # Checked once; per-period debug messages are only built when enabled
 
         for i in range(len(schedule_dates)):
             payment_date_ql = schedule_dates[i]
@@ -180,7 +181,7 @@ def generate_quantlib_cashflows(holding: CustomerHolding, evaluation_date: date)
                             log.info(f"  First Displayed Interest Calc Details - PeriodStart: {period_start_date_for_interest.ISO()}, PaymentDate: {payment_date_ql.ISO()}, DayCounter: {type(day_counter).__name__}, YearFraction: {year_fraction:.8f}")
                             first_interest_period_logged = True
                         interest_amount_for_period = current_principal_outstanding * coupon_rate_float * year_fraction
-                        log.debug(f"  Interest Calc: Date {payment_date_ql.ISO()}, PeriodStart {period_start_date_for_interest.ISO()}, Principal {current_principal_outstanding:.2f}, Rate {coupon_rate_float:.4f}, YF {year_fraction:.8f}, Full Period Interest {interest_amount_for_period:.2f}")
+                        if debug_enabled: log.debug(f"  Interest Calc: Date {payment_date_ql.ISO()}, PeriodStart {period_start_date_for_interest.ISO()}, Principal {current_principal_outstanding:.2f}, Rate {coupon_rate_float:.4f}, YF {year_fraction:.8f}, Full Period Interest {interest_amount_for_period:.2f}")
                     except Exception as int_calc_e:
                         log.error(f"CUSIP {security.cusip} (ExtTicket: {holding.external_ticket}): Error calculating year fraction or interest for period {period_start_date_for_interest.ISO()} to {payment_date_ql.ISO()}. Error: {int_calc_e}")
                         interest_amount_for_period = 0.0
@@ -208,7 +209,7 @@ def generate_quantlib_cashflows(holding: CustomerHolding, evaluation_date: date)
                 detailed_flows.append(
                     (ql.SimpleCashFlow(principal_payment_for_period, payment_date_ql), 'Principal') 
                 )
-                log.debug(f"  Stored Principal Flow: Date {payment_date_ql.ISO()}, Total P {principal_payment_for_period:.2f} (Prepayment part: {prepayment_for_period:.2f}, Scheduled part: {scheduled_principal_this_period:.2f})")
+                if debug_enabled: log.debug(f"  Stored Principal Flow: Date {payment_date_ql.ISO()}, Total P {principal_payment_for_period:.2f} (Prepayment part: {prepayment_for_period:.2f}, Scheduled part: {scheduled_principal_this_period:.2f})")
             total_flow_amount_for_period = interest_amount_for_period + principal_payment_for_period
             if abs(total_flow_amount_for_period) > tolerance:
                 combined_flows.append(ql.SimpleCashFlow(total_flow_amount_for_period, payment_date_ql))
@@ -97,6 +97,7 @@ def calculate_portfolio_metrics(holdings_list):
     par_by_sec_type = defaultdict(Decimal)
     valid_holdings_count = 0
 
+    debug_enabled = log.isEnabledFor(logging.DEBUG) # Checked once; per-item debug messages are only built when enabled
     for holding_data in holdings_list:
         is_dict = isinstance(holding_data, dict)
         security_obj_for_metrics = None # Will hold the actual Security object or a compatible structure
@@ -111,7 +112,7 @@ def calculate_portfolio_metrics(holdings_list):
             factor = holding_data.get('factor', Decimal("1.0")) # Default factor if not present
             sec_type_name = holding_data.get('security_type_name', "Unknown Offering Type")
 
-            log.debug(f"Simulated BUY: CUSIP {holding_data.get('cusip')}, Face {original_face_amount}, MktPrice {market_price}, BookPrice {book_price}, Factor {factor}, Type {sec_type_name}")
+            if debug_enabled: log.debug(f"Simulated BUY: CUSIP {holding_data.get('cusip')}, Face {original_face_amount}, MktPrice {market_price}, BookPrice {book_price}, Factor {factor}, Type {sec_type_name}")
 
         elif is_dict: # Older hypothetical holding structure (if any part still uses it - should be phased out)
             security_obj_for_metrics = holding_data.get('security')
@@ -121,7 +122,7 @@ def calculate_portfolio_metrics(holdings_list):
             # For this older dict structure, get factor and type from the security object
             factor = security_obj_for_metrics.factor if security_obj_for_metrics and security_obj_for_metrics.factor is not None else Decimal("1.0")
             sec_type_name = security_obj_for_metrics.security_type.name if security_obj_for_metrics and security_obj_for_metrics.security_type else "Unknown"
-            log.debug(f"Simulated DICT (non-buy): CUSIP {security_obj_for_metrics.cusip if security_obj_for_metrics else 'N/A'}, Face {original_face_amount}, MktPrice {market_price}, BookPrice {book_price}")
+            if debug_enabled: log.debug(f"Simulated DICT (non-buy): CUSIP {security_obj_for_metrics.cusip if security_obj_for_metrics else 'N/A'}, Face {original_face_amount}, MktPrice {market_price}, BookPrice {book_price}")
 
         else: # Actual CustomerHolding object
             security_obj_for_metrics = holding_data.security
@@ -131,7 +132,7 @@ def calculate_portfolio_metrics(holdings_list):
             # Get factor and type from the actual security object
             factor = security_obj_for_metrics.factor if security_obj_for_metrics and security_obj_for_metrics.factor is not None else Decimal("1.0")
             sec_type_name = security_obj_for_metrics.security_type.name if security_obj_for_metrics and security_obj_for_metrics.security_type else "Unknown"
-            log.debug(f"Actual Holding: ExtTicket {holding_data.external_ticket}, CUSIP {security_obj_for_metrics.cusip if security_obj_for_metrics else 'N/A'}, Face {original_face_amount}, MktPrice {market_price}, BookPrice {book_price}")
+            if debug_enabled: log.debug(f"Actual Holding: ExtTicket {holding_data.external_ticket}, CUSIP {security_obj_for_metrics.cusip if security_obj_for_metrics else 'N/A'}, Face {original_face_amount}, MktPrice {market_price}, BookPrice {book_price}")
 
         # Validate essential data for metric calculation
         if original_face_amount is None or original_face_amount <= 0:
@@ -159,12 +160,12 @@ def calculate_portfolio_metrics(holdings_list):
         if book_price is not None:
             item_book_value = (current_par_for_item * book_price) / Decimal("100.0")
             total_book_value_agg += item_book_value
-            log.debug(f"  Item Book Value: {item_book_value:.2f} (Par: {current_par_for_item:.2f}, BookPrice: {book_price})")
+            if debug_enabled: log.debug(f"  Item Book Value: {item_book_value:.2f} (Par: {current_par_for_item:.2f}, BookPrice: {book_price})")
 
         if market_price is not None:
             item_market_value = (current_par_for_item * market_price) / Decimal("100.0")
             total_market_value_agg += item_market_value
-            log.debug(f"  Item Market Value: {item_market_value:.2f} (Par: {current_par_for_item:.2f}, MarketPrice: {market_price})")
+            if debug_enabled: log.debug(f"  Item Market Value: {item_market_value:.2f} (Par: {current_par_for_item:.2f}, MarketPrice: {market_price})")
 
         par_by_sec_type[sec_type_name] += current_par_for_item
         valid_holdings_count += 1
@@ -287,14 +288,16 @@ class PortfolioViewSet(viewsets.ModelViewSet):
                 log.info("PortfolioViewSet perform_create - Calling serializer.save()...")
                 new_portfolio = serializer.save()
                 log.info(f"PortfolioViewSet perform_create - Portfolio '{new_portfolio.name}' created.")
-                if holdings_to_copy_qs:
-                    log.info(f"PortfolioViewSet perform_create - Copying {holdings_to_copy_qs.count()} holdings...")
+                # Fetch the holdings (with their securities) once; the truthiness check and log count reuse the list
+                holdings_to_copy = list(holdings_to_copy_qs.select_related('security')) if holdings_to_copy_qs is not None else []
+                if holdings_to_copy:
+                    log.info(f"PortfolioViewSet perform_create - Copying {len(holdings_to_copy)} holdings...")
                     max_ticket_result = CustomerHolding.objects.aggregate(max_ticket=Coalesce(Max('external_ticket'), Value(0)))
                     current_max_ticket = max_ticket_result['max_ticket']
                     next_ticket = max(current_max_ticket + 1, COPIED_HOLDING_TICKET_BASE)
                     log.info(f"Starting next external_ticket at: {next_ticket}")
                     new_holdings_to_create = []
-                    for original_holding in holdings_to_copy_qs.select_related('security'):
+                    for original_holding in holdings_to_copy:
                         new_holdings_to_create.append(CustomerHolding(
                             external_ticket=next_ticket, portfolio=new_portfolio, security=original_holding.security,
                             intention_code=original_holding.intention_code, original_face_amount=original_holding.original_face_amount,
@@ -490,9 +493,11 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         else:
             filtered_holdings = holding_filterset.qs
 
-        log.info(f"Aggregated CF - Initial holding count: {holdings_qs.count()}, Filtered holding count: {filtered_holdings.count()}")
+        # Evaluate once; the count for logging and the emptiness check reuse the fetched rows instead of extra COUNT/EXISTS queries
+        filtered_holdings = list(filtered_holdings)
+        log.info(f"Aggregated CF - Filtered holding count: {len(filtered_holdings)}")
 
-        if not filtered_holdings.exists():
+        if not filtered_holdings:
             log.info(f"Aggregated CF - Portfolio {portfolio.id} has no holdings matching the filter criteria. Returning empty list.")
             return Response([], status=status.HTTP_200_OK)
 
@@ -500,8 +505,9 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         total_holdings_processed = 0
         total_individual_flows = 0
 
+        debug_enabled = log.isEnabledFor(logging.DEBUG)
         for holding in filtered_holdings:
-            log.debug(f"Aggregated CF - Processing holding ExtTicket: {holding.external_ticket}")
+            if debug_enabled: log.debug(f"Aggregated CF - Processing holding ExtTicket: {holding.external_ticket}")
             if not holding.security:
                 log.warning(f"Aggregated CF - Skipping holding {holding.external_ticket}: Missing security data.")
                 continue
@@ -528,7 +534,7 @@ class PortfolioViewSet(viewsets.ModelViewSet):
                 except Exception as agg_e:
                      log.error(f"Aggregated CF - Error aggregating flow for holding {holding.external_ticket} on date {flow_date_val}: {agg_e}")
 
-        log.info(f"Aggregated CF - Processed {total_holdings_processed}/{filtered_holdings.count()} filtered holdings, aggregating {total_individual_flows} individual flows for portfolio {portfolio.id}.")
+        log.info(f"Aggregated CF - Processed {total_holdings_processed}/{len(filtered_holdings)} filtered holdings, aggregating {total_individual_flows} individual flows for portfolio {portfolio.id}.")
         formatted_response = []
         for flow_date_obj in sorted(aggregated_flows_by_date.keys()):
             data = aggregated_flows_by_date[flow_date_obj]